@@ -0,0 +1,161 @@
+"""
+Fake Telegram Bot API server for running the bot locally without Telegram.
+Answers bot API calls with plausible results and forwards test updates to the webhook.
+
+Usage:
+    python3 app/fake_telegram_api.py
+    TG_API_SERVER=http://localhost:8081 BOT_MODE=webhook \\
+        WEBHOOK_URL=http://localhost:8080/webhook python3 app/main.py
+    curl -X POST localhost:8081/updates -d '{"text": "бпи22-01"}'
+"""
+
+import itertools
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+from aiohttp import ClientSession, web
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+BOT_USER = {
+    "id": 1,
+    "is_bot": True,
+    "first_name": "Pallada",
+    "username": "pallada_test_bot",
+    "can_join_groups": True,
+    "can_read_all_group_messages": False,
+    "supports_inline_queries": True,
+}
+TEST_USER = {"id": 1000, "is_bot": False, "first_name": "Test", "username": "test"}
+
+# Methods that return the sent or edited message
+MESSAGE_METHODS = {
+    "sendMessage",
+    "editMessageText",
+    "editMessageReplyMarkup",
+    "sendDocument",
+    "sendPhoto",
+}
+
+
+class FakeTelegramAPI:
+    """
+    In-memory stand-in for api.telegram.org.
+    """
+
+    def __init__(self):
+        self.webhook_url: Optional[str] = None
+        self.secret_token: Optional[str] = None
+        self.calls = 0
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+
+    async def _params(self, request: web.Request) -> Dict[str, Any]:
+        """Read method parameters sent as form data or JSON"""
+        if request.content_type == "application/json":
+            return await request.json()
+        return dict(await request.post())
+
+    def _message(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a message object for send and edit methods"""
+        message_id = params.get("message_id") or next(self._message_ids)
+        chat_id = params.get("chat_id") or TEST_USER["id"]
+        return {
+            "message_id": int(message_id),
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id), "type": "private"},
+            "from": BOT_USER,
+            "text": params.get("text", ""),
+        }
+
+    async def handle_method(self, request: web.Request) -> web.Response:
+        """Answer any Bot API method"""
+        method = request.match_info["method"]
+        params = await self._params(request)
+        self.calls += 1
+        logger.info(f"{method} {str(params.get('text', ''))[:60]!r}")
+
+        if method == "getMe":
+            result: Any = BOT_USER
+        elif method == "setWebhook":
+            self.webhook_url = params.get("url")
+            self.secret_token = params.get("secret_token")
+            result = True
+        elif method == "deleteWebhook":
+            self.webhook_url = None
+            result = True
+        elif method in MESSAGE_METHODS:
+            result = self._message(params)
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        """
+        Deliver a test update to the registered webhook.
+        Body is a full update, {"text": ...} for a message or {"callback": ...} for a button tap.
+        """
+        if not self.webhook_url:
+            return web.json_response({"ok": False, "error": "webhook is not set"}, status=409)
+
+        body = await request.json()
+        update_id = next(self._update_ids)
+        user = {**TEST_USER, "id": int(body.get("user_id", TEST_USER["id"]))}
+        chat = {"id": user["id"], "type": "private"}
+        if "text" in body:
+            body = {
+                "update_id": update_id,
+                "message": {
+                    "message_id": next(self._message_ids),
+                    "date": int(time.time()),
+                    "chat": chat,
+                    "from": user,
+                    "text": body["text"],
+                },
+            }
+        elif "callback" in body:
+            body = {
+                "update_id": update_id,
+                "callback_query": {
+                    "id": str(update_id),
+                    "from": user,
+                    "chat_instance": str(user["id"]),
+                    "data": body["callback"],
+                    "message": {
+                        "message_id": int(body.get("message_id", 1)),
+                        "date": int(time.time()),
+                        "chat": chat,
+                        "from": BOT_USER,
+                        "text": "",
+                    },
+                },
+            }
+
+        headers = {"X-Telegram-Bot-Api-Secret-Token": self.secret_token or ""}
+        async with ClientSession() as session:
+            async with session.post(
+                self.webhook_url, data=json.dumps(body), headers=headers
+            ) as response:
+                return web.json_response({"ok": True, "status": response.status})
+
+
+def create_app() -> web.Application:
+    """
+    Create the fake API application.
+    """
+    api = FakeTelegramAPI()
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", api.handle_method)
+    app.router.add_post("/updates", api.handle_update)
+    app["api"] = api
+    return app
+
+
+if __name__ == "__main__":
+    web.run_app(create_app(), port=int(os.getenv("FAKE_API_PORT", "8081")))
@@ -1,15 +1,37 @@
 import asyncio
 import logging
 import os
-from typing import NoReturn
+from dataclasses import replace
+from datetime import time as dt_time
+from typing import Dict, NoReturn
 
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.fsm.storage.base import BaseStorage
 from aiogram.fsm.storage.memory import MemoryStorage
 from dotenv import load_dotenv
 
 from routers.user import user_router
-from services.search_results import fetch_database_sync
+from services.search_results import SearchResultList, fetch_database_sync
 from services.notification_processor import NotificationManager
+from services.notification_sqlite import SQLiteNotificationManager
+from services.notification_digest import NotificationDigest
+from services.schedule_cache import RenderCache, ScheduleStore
+from services.deep_links import DeepLinkService
+from services.inline_search import InlineSearchService
+from services.debounce import RenderDebouncer
+from services.ai import AIProvider, G4FProvider, StubProvider, SummaryCache
+from services.ai_queue import AIJobQueue
+from services.ai_batch import SummaryPrecomputer
+from services.google_calendar import CalendarClient
+from services.export_jobs import ExportJobManager
+from services.calendar_export import IcsCache
+from services import fsm_storage
+from services.webhook import run_webhook
+from middlewares.concurrency import ConcurrencyMiddleware
+from middlewares.throttling import DEFAULT_LIMITS, ThrottleLimit, ThrottlingMiddleware
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -21,26 +43,202 @@ load_dotenv()
 if not (token := os.getenv("TG_BOT_TOKEN")):
     raise ValueError("TG_BOT_TOKEN environment variable is not set")
 
-bot = Bot(token=token)
 
-storage = MemoryStorage()
+def create_bot(token: str) -> Bot:
+    """
+    Create the bot, optionally pointed at another Bot API server by TG_API_SERVER.
+    """
+    if api_server := os.getenv("TG_API_SERVER"):
+        session = AiohttpSession(api=TelegramAPIServer.from_base(api_server))
+        return Bot(token=token, session=session)
+    return Bot(token=token)
+
+
+bot = create_bot(token)
+
+
+def create_fsm_storage() -> BaseStorage:
+    """
+    Create the FSM storage selected by FSM_STORAGE (memory, sqlite or redis).
+    """
+    backend = os.getenv("FSM_STORAGE", "memory")
+    ttl = int(os.getenv("FSM_TTL", str(7 * 24 * 3600)))
+    if backend == "sqlite":
+        return fsm_storage.SQLiteStorage(
+            os.getenv("FSM_DB_PATH", "database/fsm.sqlite3"), ttl=ttl
+        )
+    if backend == "redis":
+        # Optional dependency, install with `uv pip install redis`
+        from aiogram.fsm.storage.redis import DefaultKeyBuilder, RedisStorage
+
+        return RedisStorage.from_url(
+            os.getenv("FSM_REDIS_URL", "redis://localhost:6379/0"),
+            key_builder=DefaultKeyBuilder(with_bot_id=True, with_destiny=True),
+            state_ttl=ttl,
+            data_ttl=ttl,
+            json_loads=fsm_storage.loads,
+            json_dumps=fsm_storage.dumps,
+        )
+    if backend != "memory":
+        raise ValueError(f"Unknown FSM_STORAGE: {backend}")
+    return MemoryStorage()
+
+
+storage = create_fsm_storage()
 dp = Dispatcher(storage=storage)
 
 
+def create_notification_manager(
+    search_results: SearchResultList,
+) -> NotificationManager | SQLiteNotificationManager:
+    """
+    Create the subscription storage selected by NOTIFY_BACKEND (json or sqlite).
+    """
+    backend = os.getenv("NOTIFY_BACKEND", "json")
+    if backend == "sqlite":
+        return SQLiteNotificationManager(
+            os.getenv("NOTIFY_DB_PATH", "database/users.sqlite3"),
+            legacy_json_path="database/users.json",
+            search_results=search_results,
+        )
+    if backend != "json":
+        raise ValueError(f"Unknown NOTIFY_BACKEND: {backend}")
+    return NotificationManager(search_results=search_results)
+
+
+def create_ai_provider() -> AIProvider:
+    """
+    Create AI provider from AI_PROVIDER: g4f (default) or stub for offline runs.
+    """
+    provider = os.getenv("AI_PROVIDER", "g4f")
+    if provider == "stub":
+        return StubProvider(delay=float(os.getenv("AI_STUB_DELAY", "0.05")))
+    if provider != "g4f":
+        raise ValueError(f"Unknown AI_PROVIDER: {provider}")
+    return G4FProvider(
+        max_workers=int(os.getenv("AI_WORKERS", "4")),
+        timeout=float(os.getenv("AI_TIMEOUT", "120")),
+    )
+
+
+def create_throttle_limits() -> Dict[str, ThrottleLimit]:
+    """
+    Read per-minute limits like THROTTLE_AI_PER_MINUTE and THROTTLE_AI_GLOBAL_PER_MINUTE.
+    """
+    limits = {}
+    for operation, limit in DEFAULT_LIMITS.items():
+        prefix = f"THROTTLE_{operation.upper()}"
+        limits[operation] = replace(
+            limit,
+            user_per_minute=float(os.getenv(f"{prefix}_PER_MINUTE", str(limit.user_per_minute))),
+            global_per_minute=float(
+                os.getenv(f"{prefix}_GLOBAL_PER_MINUTE", str(limit.global_per_minute))
+            ),
+        )
+    return limits
+
+
 async def init_dispatcher() -> None:
     """
     Initialize dispatcher with required data and routers.
     """
     dp["search_results"] = fetch_database_sync("cache/search_results.json")
-    dp["notifyer"] = NotificationManager()
+    dp["notifyer"] = create_notification_manager(dp["search_results"])
+    dp["digest"] = NotificationDigest(
+        bot, window=float(os.getenv("NOTIFY_DIGEST_WINDOW", "0"))
+    )
 
+    dp["render_cache"] = RenderCache(maxsize=int(os.getenv("RENDER_CACHE_SIZE", "4096")))
+    dp["schedule_store"] = ScheduleStore(maxsize=int(os.getenv("SCHEDULE_CACHE_SIZE", "512")))
+    dp["debouncer"] = RenderDebouncer(window=float(os.getenv("NAV_DEBOUNCE_WINDOW", "0.3")))
+    dp["ai_provider"] = create_ai_provider()
+    dp["summary_cache"] = SummaryCache(ttl=float(os.getenv("AI_CACHE_TTL", str(24 * 3600))))
+    dp["ai_queue"] = AIJobQueue(
+        dp["ai_provider"],
+        dp["summary_cache"],
+        workers=int(os.getenv("AI_WORKERS", "4")),
+    )
+    dp["ai_precomputer"] = SummaryPrecomputer(
+        dp["schedule_store"],
+        dp["summary_cache"],
+        dp["ai_provider"],
+        top=int(os.getenv("AI_PRECOMPUTE_TOP", "100")),
+        concurrency=int(os.getenv("AI_PRECOMPUTE_CONCURRENCY", "2")),
+        run_at=dt_time.fromisoformat(os.getenv("AI_PRECOMPUTE_AT", "03:00")),
+    )
+    if dp["ai_precomputer"].top > 0:
+        dp["ai_precomputer"].start()
+    dp["calendar_client"] = CalendarClient(
+        os.getenv("GOOGLE_CALENDAR_CREDS_PATH", ".credentials/credentials.json"),
+        index_path=os.getenv("CALENDAR_INDEX_PATH", "database/calendars.json"),
+        max_workers=int(os.getenv("CALENDAR_WORKERS", "8")),
+    )
+    dp["export_jobs"] = ExportJobManager(
+        max_concurrency=int(os.getenv("CALENDAR_EXPORT_CONCURRENCY", "2"))
+    )
+    dp["ics_cache"] = IcsCache(maxsize=int(os.getenv("ICS_CACHE_SIZE", "256")))
+    dp["deep_links"] = DeepLinkService(bot)
+    await dp["deep_links"].warm(dp["search_results"])
+    dp["inline_search"] = InlineSearchService(dp["search_results"], dp["deep_links"])
+    dp["inline_search"].warm()
+
+    dp["concurrency"] = ConcurrencyMiddleware(
+        max_concurrency=int(os.getenv("UPDATE_CONCURRENCY", "100")),
+        report_interval=float(os.getenv("UPDATE_METRICS_INTERVAL", "60")),
+    )
+    dp.update.outer_middleware(dp["concurrency"])
+    dp["throttling"] = ThrottlingMiddleware(storage, create_throttle_limits())
+    dp.message.outer_middleware(dp["throttling"])
+    dp.callback_query.outer_middleware(dp["throttling"])
+
+    # Services still use the FSM storage while closing, so run before the
+    # dispatcher's own shutdown hook closes it
+    dp.shutdown.handlers.insert(0, HandlerObject(callback=on_shutdown))
     dp.include_router(user_router)
 
 
+async def on_shutdown() -> None:
+    """
+    Flush buffered state before the bot stops.
+    The FSM storage is closed by the dispatcher afterwards.
+    """
+    await dp["concurrency"].close()
+    await dp["debouncer"].close()
+    await dp["ai_precomputer"].close()
+    await dp["ai_queue"].close()
+    await dp["ai_provider"].close()
+    await dp["export_jobs"].close()
+    await dp["calendar_client"].close()
+    await dp["digest"].close()
+    await dp["notifyer"].close()
+
+
 async def start_bot() -> None:
     """
-    Start the bot by initializing the dispatcher and starting polling.
+    Start the bot in the mode selected by BOT_MODE (polling or webhook).
     """
+    mode = os.getenv("BOT_MODE", "polling")
+    if mode == "webhook":
+        if not (url := os.getenv("WEBHOOK_URL")):
+            raise ValueError("WEBHOOK_URL environment variable is not set")
+        # Without it anyone who finds the webhook path can post forged updates
+        if not (secret_token := os.getenv("WEBHOOK_SECRET")):
+            raise ValueError("WEBHOOK_SECRET environment variable is not set")
+        logger.info("Starting bot webhook server...")
+        await run_webhook(
+            dp,
+            bot,
+            url=url,
+            secret_token=secret_token,
+            host=os.getenv("WEBHOOK_HOST", "0.0.0.0"),
+            port=int(os.getenv("WEBHOOK_PORT", "8080")),
+            path=os.getenv("WEBHOOK_PATH", "/webhook"),
+            max_connections=int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40")),
+        )
+        return
+    if mode != "polling":
+        raise ValueError(f"Unknown BOT_MODE: {mode}")
+
     await bot.delete_webhook(drop_pending_updates=True)
     logger.info("Starting bot polling...")
     await dp.start_polling(bot)
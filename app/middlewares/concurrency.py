@@ -0,0 +1,148 @@
+"""
+Concurrency middleware module.
+Processes updates from different chats in parallel with a global limit
+and keeps updates from one chat in arrival order.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+logger = logging.getLogger(__name__)
+
+
+class ConcurrencyMiddleware(BaseMiddleware):
+    """
+    Outer update middleware with per-chat ordering and bounded global concurrency.
+    """
+
+    def __init__(self, max_concurrency: int = 100, report_interval: float = 60):
+        """
+        Initialize ConcurrencyMiddleware with the number of updates processed at once
+        and the interval in seconds between metrics log lines (0 disables them).
+        """
+        self.max_concurrency = max_concurrency
+        self.report_interval = report_interval
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # chat id -> [lock, number of updates holding or waiting for it]
+        self._chat_locks: Dict[int, list] = {}
+
+        # Metrics
+        self.pending = 0  # updates waiting or being processed
+        self.in_flight = 0
+        self.processed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._report_task: Optional[asyncio.Task] = None
+
+    @property
+    def queue_depth(self) -> int:
+        """Updates waiting for their chat or a free slot"""
+        return self.pending - self.in_flight
+
+    def _acquire_chat(self, chat_id: int) -> asyncio.Lock:
+        """Get the chat lock and count this update as its user"""
+        entry = self._chat_locks.setdefault(chat_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        return entry[0]
+
+    def _release_chat(self, chat_id: int) -> None:
+        """Drop the chat lock once no update uses it"""
+        entry = self._chat_locks[chat_id]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._chat_locks[chat_id]
+
+    def _chat_id(self, data: Dict[str, Any]) -> Optional[int]:
+        """Chat of the update, or the user for updates without a chat"""
+        if chat := data.get("event_chat"):
+            return chat.id
+        if user := data.get("event_from_user"):
+            return user.id
+        return None
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Get current queue and wait time metrics.
+        """
+        return {
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "processed": self.processed,
+            "avg_wait_ms": self.total_wait / self.processed * 1000 if self.processed else 0.0,
+            "max_wait_ms": self.max_wait * 1000,
+            "active_chats": len(self._chat_locks),
+        }
+
+    async def _report(self) -> None:
+        """Log metrics periodically while updates are being processed"""
+        last_processed = 0
+        while True:
+            await asyncio.sleep(self.report_interval)
+            if self.processed == last_processed and not self.queue_depth:
+                continue
+            last_processed = self.processed
+            metrics = self.snapshot()
+            logger.info(
+                f"Updates: queued={metrics['queue_depth']}, in flight={metrics['in_flight']}, "
+                f"processed={metrics['processed']}, avg wait={metrics['avg_wait_ms']:.1f}ms, "
+                f"max wait={metrics['max_wait_ms']:.1f}ms"
+            )
+            self.max_wait = 0.0
+
+    async def _process(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+        queued_at: float,
+    ) -> Any:
+        """Wait for a free slot, then run the handler"""
+        async with self._semaphore:
+            wait = time.monotonic() - queued_at
+            self.in_flight += 1
+            self.processed += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            try:
+                return await handler(event, data)
+            finally:
+                self.in_flight -= 1
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if self.report_interval and self._report_task is None:
+            self._report_task = asyncio.create_task(self._report())
+
+        queued_at = time.monotonic()
+        chat_id = self._chat_id(data)
+        self.pending += 1
+        try:
+            if chat_id is None:
+                return await self._process(handler, event, data, queued_at)
+
+            # Lock waiters are woken in arrival order, so one chat's updates stay ordered
+            lock = self._acquire_chat(chat_id)
+            try:
+                async with lock:
+                    return await self._process(handler, event, data, queued_at)
+            finally:
+                self._release_chat(chat_id)
+        finally:
+            self.pending -= 1
+
+    async def close(self) -> None:
+        """
+        Stop the metrics reporter.
+        """
+        if self._report_task is not None:
+            self._report_task.cancel()
+            self._report_task = None
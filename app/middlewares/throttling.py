@@ -0,0 +1,217 @@
+"""
+Throttling middleware module.
+Limits expensive operations (upstream fetches, AI, calendar export) with
+token buckets per user and a global budget kept in the FSM storage, so
+limits hold across bot instances sharing a SQLite or Redis storage.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+logger = logging.getLogger(__name__)
+
+# Storage destiny of bucket records, separate from user states
+THROTTLE_DESTINY = "throttle"
+# User id of the global bucket records
+GLOBAL_BUCKET_ID = 0
+# Throttled text messages get a reply at most this often
+WARNING_INTERVAL = 10
+
+
+@dataclass
+class ThrottleLimit:
+    """
+    Bucket sizes of one operation, refilled evenly over a minute.
+    """
+    user_per_minute: float
+    global_per_minute: float
+    user_message: str = "Слишком много запросов, попробуйте через минуту"
+    global_message: str = "Бот сейчас перегружен, попробуйте немного позже"
+
+
+DEFAULT_LIMITS = {
+    "fetch": ThrottleLimit(20, 600),
+    "ai": ThrottleLimit(
+        3, 30, user_message="AI-анализ можно запрашивать не чаще 3 раз в минуту"
+    ),
+    "calendar": ThrottleLimit(
+        1, 10, user_message="Экспорт в календарь доступен не чаще раза в минуту"
+    ),
+}
+
+def get_operation(event: TelegramObject) -> Optional[str]:
+    """
+    Get the expensive operation a message triggers, if any.
+    Callback operations may be served from caches, their handlers charge them.
+    """
+    if isinstance(event, Message) and event.text:
+        # Schedule searches and /start deep links fetch from upstream
+        if not event.text.startswith("/") or event.text.startswith("/start "):
+            return "fetch"
+    return None
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Outer message and callback middleware enforcing ThrottleLimit per operation.
+    Messages are charged before the handler runs. Callback handlers get a
+    `throttle(operation)` callable and charge only work that is actually started.
+    """
+
+    def __init__(
+        self,
+        storage: BaseStorage,
+        limits: Optional[Dict[str, ThrottleLimit]] = None,
+    ):
+        """
+        Initialize ThrottlingMiddleware with bucket storage and limits per operation.
+        """
+        self.storage = storage
+        self.limits = limits or DEFAULT_LIMITS
+        # (bot id, user id) -> [lock, number of holders and waiters], serializes
+        # updates of one user's buckets within this process
+        self._user_locks: Dict[Tuple[int, int], list] = {}
+        # (bot id, operation) -> global bucket of this process, guarded by _global_lock
+        self._global_buckets: Dict[Tuple[int, str], Dict[str, float]] = {}
+        self._global_lock = asyncio.Lock()
+        self.throttled = 0
+
+    def _key(self, bot_id: int, user_id: int) -> StorageKey:
+        return StorageKey(
+            bot_id=bot_id, chat_id=user_id, user_id=user_id, destiny=THROTTLE_DESTINY
+        )
+
+    def _refill(self, bucket: Dict[str, Any], per_minute: float, now: float) -> float:
+        """Tokens in a bucket after refilling for the time passed"""
+        if "ts" not in bucket:
+            return per_minute
+        elapsed = max(0.0, now - bucket["ts"])
+        return min(per_minute, bucket["tokens"] + elapsed * per_minute / 60)
+
+    @asynccontextmanager
+    async def _user_locked(self, bot_id: int, user_id: int) -> AsyncIterator[None]:
+        """Hold the lock of a user's buckets, dropping it once nobody needs it"""
+        lock_key = (bot_id, user_id)
+        entry = self._user_locks.setdefault(lock_key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._user_locks[lock_key]
+
+    async def _take_global(
+        self, bot_id: int, operation: str, limit: ThrottleLimit, now: float
+    ) -> bool:
+        """
+        Take a token from the global bucket of an operation.
+        The bucket is kept in memory and merged with the stored one of other
+        instances, storage round-trips happen outside the lock.
+        """
+        global_key = self._key(bot_id, GLOBAL_BUCKET_ID)
+        stored = (await self.storage.get_data(global_key)).get(operation, {})
+
+        async with self._global_lock:
+            bucket = self._global_buckets.setdefault((bot_id, operation), {})
+            # Tokens other instances took show up as a lower stored count
+            tokens = min(
+                self._refill(bucket, limit.global_per_minute, now),
+                self._refill(stored, limit.global_per_minute, now),
+            )
+            if tokens < 1:
+                return False
+            bucket.update(tokens=tokens - 1, ts=now)
+            snapshot = dict(bucket)
+
+        await self.storage.update_data(global_key, {operation: snapshot})
+        return True
+
+    async def _take(
+        self, bot_id: int, user_id: int, operation: str, limit: ThrottleLimit
+    ) -> Optional[str]:
+        """
+        Take a token from the user's and the global bucket.
+        Returns the reason to refuse, or None if the operation may proceed.
+        """
+        async with self._user_locked(bot_id, user_id):
+            now = time.time()
+            user_key = self._key(bot_id, user_id)
+            user_data = await self.storage.get_data(user_key)
+            user_bucket = user_data.get(operation, {})
+            user_tokens = self._refill(user_bucket, limit.user_per_minute, now)
+
+            if user_tokens < 1:
+                reason = limit.user_message
+            elif not await self._take_global(bot_id, operation, limit, now):
+                reason = limit.global_message
+            else:
+                reason = None
+                user_tokens -= 1
+
+            # Warn about throttled text messages only once in a while
+            warned_at = user_bucket.get("warned_at", 0.0)
+            user_data[operation] = {"tokens": user_tokens, "ts": now, "warned_at": warned_at}
+            if reason and now - warned_at < WARNING_INTERVAL:
+                reason = ""
+            elif reason:
+                user_data[operation]["warned_at"] = now
+            await self.storage.set_data(user_key, user_data)
+            return reason
+
+    async def _refuse(
+        self, event: TelegramObject, user_id: int, operation: str, reason: str
+    ) -> None:
+        """Tell the user an operation was throttled"""
+        self.throttled += 1
+        logger.info(f"Throttled {operation} for user {user_id}")
+        if isinstance(event, CallbackQuery):
+            await event.answer(reason or self.limits[operation].user_message, show_alert=True)
+        elif reason:
+            await event.answer(reason)
+
+    async def charge(
+        self, event: CallbackQuery, bot_id: int, user_id: int, operation: str
+    ) -> bool:
+        """
+        Take a token for an operation a callback handler is about to start.
+        Answers the callback and returns False if the operation is throttled.
+        """
+        if operation not in self.limits:
+            return True
+        reason = await self._take(bot_id, user_id, operation, self.limits[operation])
+        if reason is None:
+            return True
+        await self._refuse(event, user_id, operation, reason)
+        return False
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if isinstance(event, CallbackQuery) and user is not None:
+            data["throttle"] = partial(self.charge, event, data["bot"].id, user.id)
+
+        operation = get_operation(event)
+        if operation not in self.limits or user is None:
+            return await handler(event, data)
+
+        reason = await self._take(data["bot"].id, user.id, operation, self.limits[operation])
+        if reason is None:
+            return await handler(event, data)
+
+        await self._refuse(event, user.id, operation, reason)
+        return None
@@ -1,50 +1,58 @@
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 
 from aiogram import Router, F
 from aiogram.types import (
+    BufferedInputFile,
     CallbackQuery,
+    InlineKeyboardMarkup,
+    InlineQuery,
     Message,
 )
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import CommandStart, Command, CommandObject
 from aiogram.utils.chat_action import ChatActionSender
 from aiogram.fsm.context import FSMContext
-from aiogram.utils.deep_linking import decode_payload, create_start_link
+from aiogram.utils.deep_linking import decode_payload
 from aiogram.enums import ParseMode
 from aiogram.types import LinkPreviewOptions
-import g4f
 from gcsa.event import Event
-from gcsa.google_calendar import GoogleCalendar
 from gcsa.recurrence import Recurrence, WEEKLY
-from gcsa.calendar import Calendar
-from gcsa.acl import AccessControlRule, ACLRole, ACLScopeType
+from googleapiclient.errors import HttpError
 
 from states import UserStates
 from keyboards import schedule_pagination_keyboard, help_keyboard
 from services.notification_processor import NotificationManager
+from services.notification_digest import NotificationDigest
 from services.search_results import SearchResultList
+from services.schedule_cache import (
+    DAYS_OF_WEEK,
+    CachedSchedule,
+    NavigationTable,
+    RenderCache,
+    ScheduleStore,
+)
+from services.deep_links import DeepLinkService
+from services.inline_search import InlineSearchService
+from services.debounce import RenderDebouncer
+from services.ai import SummaryCache, build_summary_prompt
+from services.ai_queue import AIJob, AIJobQueue, UserBusyError
+from services.streaming_message import StreamingMessage
+from services.google_calendar import CalendarClient
+from services.export_jobs import ExportJobManager
+from services.calendar_export import IcsCache, format_place, regular_lessons, semester_bounds
 from services.parsers import group_parser, professor_parser
 
 import asyncio
+import hashlib
 from functools import partial
-from collections import defaultdict
 import random
 
 logger = logging.getLogger(__name__)
 
 user_router = Router()
 
-DAYS_OF_WEEK = {
-    0: "Понедельник",
-    1: "Вторник",
-    2: "Среда",
-    3: "Четверг",
-    4: "Пятница",
-    5: "Суббота",
-    6: "Воскресенье",
-}
-
 TIME_TO_EMOJI = {
     "08:00": "1️⃣",
     "09:40": "2️⃣",
@@ -56,54 +64,8 @@ TIME_TO_EMOJI = {
     "20:10": "8️⃣",
 }
 
-request_template = """
-Ты - помощник для студентов и преподавателей, анализирующий расписание занятий и дающий полезные рекомендации.
-
-Вот расписание занятий на день, представленное в формате:
-
-<День недели> - <Номер недели>
-<Название предмета>
-<Номер пары> <Время начала> - <Время окончания> | <Тип занятия>
-<Место проведения>
-<ФИО преподавателя>/<Группы>
-
-{schedule}
-
-Проанализируй это расписание и предоставь результат в следующем формате:
-
-*Общий анализ:*
-
-•   Количество пар. / Количество предметов.
-•   Типы занятий (лекции, лабораторные, практики).
-•   Общее описание загрузки (насколько насыщенный день) + "Цвет дня (3 эмодзи нужного цвета по теме пар)" (4 и больше пар это красный цвет, 3 пары это оранжевый, 2 пары это желтый, 1 пара это зеленый)
-
-*Ключевые моменты:*
-
-•   Особое внимание обрати на пары, которые идут подряд по одному предмету, с разницей в 10-20 минут, если они есть. Отметь, что это может быть как плюсом, так и минусом
-•   Обрати внимание на перемещение между корпусами. Укажи, если есть такие перемещения, и на то, что нужно учитывать время на дорогу.
-•   Определи, есть ли какие-либо особенности в распределении типов занятий (например, все лабораторные утром, а лекции вечером).
-•   Отметь, если есть разрывы между занятиями, которые можно использовать для отдыха или самостоятельной работы.
-
-*Рекомендации (основанные на анализе расписания):*
-
-•   Дай практические советы по подготовке к конкретным типам занятий (например, заранее повторить теорию для лабораторных, подготовиться к практическим заданиям).
-•   Дай советы по управлению временем с учетом перемещений между корпусами.
-•   Предложи способы оптимизации дня (например, использовать разрывы между занятиями с пользой, приносить с собой воду и перекус).
-•   Дай общие советы по поддержанию продуктивности в течение дня.
-
-В анализе используй краткие, четкие и понятные формулировки, избегай сложных и пространных выражений.
-Направь анализ таким образом, чтобы он был максимально полезен и практичен для студента при это не душным, который будет это читать
-Используй эмоджи. (например цифры кубиками)
-"""
-
 MAPS_SEARCH_TEMPLATE = "https://2gis.ru/krasnoyarsk/search/{query}"
 
-GOOGLE_CALENDAR_CREDS_PATH = ".credentials/credentials.json"
-
-calendar_locks = defaultdict(
-    lambda: None
-)  # Global dictionary to track calendar creation locks
-
 PROGRESS_EMOJIS = [
     "🎓",
     "📚",
@@ -123,20 +85,102 @@ PROGRESS_EMOJIS = [
     "🎲",
 ]
 PROGRESS_BAR_LENGTH = 10
+PROGRESS_INTERVAL = 1.0  # Minimum seconds between progress bar edits
+AI_STREAM_INTERVAL = 1.5  # Minimum seconds between edits of a streaming AI answer
+
+
+def _format_lesson_place(place: str) -> str:
+    """Format lesson place as short room name with a map link"""
+    place_title, _, place_text = place.partition(" / ")
+    return f"{format_place(place_text)} <a href='{MAPS_SEARCH_TEMPLATE.format(query=place_title)}'>📍</a>"
+
+
+def _relative_day_suffix(day_name: str, current_week_index: int) -> str:
+    """Get ' (Сегодня)'/' (Завтра)'/' (Вчера)' label for a day of the regular schedule"""
+    current_date = datetime.now()
+    current_weekday = current_date.weekday()
+    current_week_number = (
+        current_date.isocalendar()[1] % 2
+    )  # Get 0 or 1 for even/odd week
+
+    is_today = (current_week_number == (current_week_index - 1)) and DAYS_OF_WEEK[
+        current_weekday
+    ] == day_name
+    is_tomorrow = (
+        current_week_number == (current_week_index - 1)
+        and DAYS_OF_WEEK[(current_weekday + 1) % 7] == day_name
+    ) or (
+        current_week_number != (current_week_index - 1)
+        and current_weekday == 6
+        and DAYS_OF_WEEK[0] == day_name
+    )
+    is_yesterday = (
+        current_week_number == (current_week_index - 1)
+        and DAYS_OF_WEEK[(current_weekday - 1) % 7] == day_name
+    ) or (
+        current_week_number != (current_week_index - 1)
+        and current_weekday == 0
+        and DAYS_OF_WEEK[6] == day_name
+    )
 
-
-def _format_place(place: str) -> str:
-    """Format place string from 'корп. "Н" каб. "205"' to 'Н-205'"""
-    try:
-        # Extract values in quotes using string operations
-        parts = place.split('"')
-        if len(parts) >= 4:  # Ensure we have both building and room
-            building = parts[1].strip()
-            room = parts[3].strip()
-            return f"{building}-{room}"
-        return place  # Return original if can't parse
-    except Exception:
-        return place  # Return original if any error occurs
+    if is_today:
+        return " (Сегодня)"
+    elif is_tomorrow:
+        return " (Завтра)"
+    elif is_yesterday:
+        return " (Вчера)"
+    return ""
+
+
+def _relative_date_suffix(day_name: str) -> str:
+    """Get ' (Сегодня)'/' (Завтра)'/' (Вчера)' label for a session or consultation day"""
+    today = datetime.now().strftime("%A").lower()
+    if day_name.lower() == today:
+        return " (Сегодня)"
+    elif day_name.lower() == (datetime.now() + timedelta(days=1)).strftime("%A").lower():
+        return " (Завтра)"
+    elif day_name.lower() == (datetime.now() - timedelta(days=1)).strftime("%A").lower():
+        return " (Вчера)"
+    return ""
+
+
+def _render_hash(text: str, reply_markup: InlineKeyboardMarkup) -> str:
+    """Hash of rendered message text and keyboard"""
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8)
+    digest.update(reply_markup.model_dump_json(exclude_none=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+async def _resolve_schedule(
+    schedule_store: ScheduleStore, state: FSMContext, data: Dict
+) -> Optional[CachedSchedule]:
+    """
+    Resolve the schedule of the user's state.
+    If the referenced version is gone and a newer one was loaded instead,
+    the state is moved to it and reopened on the current day.
+    """
+    ref = data.get("schedule_ref")
+    if ref is None:
+        return None
+    entry = schedule_store.get(ref)
+    if entry is None or entry.ref == ref:
+        return entry
+
+    # Day and week indexes of another version may point past its days
+    current_week = datetime.now().isocalendar()[1]
+    week_is_even = 1 if current_week % 2 == 0 else 2
+    current_day_index, num_max_days, week_number = _calculate_current_day(
+        entry.navigation, week_is_even
+    )
+    data.update(
+        schedule_ref=entry.ref,
+        current_week_index=week_number,
+        current_day_index=current_day_index,
+        max_weeks=len(entry.schedule.weeks),
+        num_max_days=num_max_days,
+    )
+    await state.set_data(data)
+    return entry
 
 
 async def _render_schedule(
@@ -144,6 +188,9 @@ async def _render_schedule(
     user_id: int,
     state: FSMContext,
     notifyer: NotificationManager,
+    render_cache: RenderCache,
+    deep_links: DeepLinkService,
+    schedule_store: ScheduleStore,
     update: bool = False,
 ) -> None:
     """
@@ -159,41 +206,100 @@ async def _render_schedule(
             return
 
         render_funcs = {
-            "group": _render_group_schedule,
-            "professor": _render_professor_schedule,
+            "group": _build_group_schedule_text,
+            "professor": _build_professor_schedule_text,
         }
 
         render_func = render_funcs.get(schedule_type)
-        if render_func:
-            await render_func(message, user_id, state, notifyer, update)
-        else:
+        if not render_func:
             logger.error(f"Unknown schedule type: {schedule_type}")
             await message.answer("Internal error: invalid schedule type")
+            return
+
+        entry = await _resolve_schedule(schedule_store, state, data)
+        if entry is None:
+            logger.error(f"Schedule {data.get('schedule_ref')} not found in store")
+            await message.answer("Session expired, please restart")
+            return
+
+        schedule = entry.schedule
+        current_tab = data["current_tab"]
+        current_week_index = data["current_week_index"]
+        current_day_index = data["current_day_index"]
+
+        # Rendered text is shared by all users viewing the same schedule position
+        cache_key = (
+            entry.content_hash,
+            schedule.source,
+            datetime.now().date(),
+            current_tab,
+            current_week_index,
+            current_day_index,
+        )
+        text = render_cache.get(cache_key)
+        if text is None:
+            text = await render_func(
+                deep_links, schedule, current_tab, current_week_index, current_day_index
+            )
+            render_cache.put(cache_key, text)
+
+        subscribed = await notifyer.is_subscribed(user_id, entry.key)
+        name = schedule.group_name if schedule_type == "group" else schedule.person_name
+        link = await deep_links.get(name)
+        reply_markup = schedule_pagination_keyboard(
+            current_tab,
+            current_week_index,
+            current_day_index,
+            data["num_max_days"],
+            schedule_type,
+            subscribed,
+            link,
+        )
+
+        # Skip edits that would not change the message
+        render_hash = _render_hash(text, reply_markup)
+        if update and data.get("last_render") == [message.message_id, render_hash]:
+            logger.debug(f"Skipping unchanged render of message {message.message_id}")
+            return
+
+        if not update:
+            message = await message.answer(
+                text,
+                reply_markup=reply_markup,
+                parse_mode=ParseMode.HTML,
+                link_preview_options=LinkPreviewOptions(is_disabled=True),
+            )
+        else:
+            try:
+                await message.edit_text(
+                    text,
+                    reply_markup=reply_markup,
+                    parse_mode=ParseMode.HTML,
+                    link_preview_options=LinkPreviewOptions(is_disabled=True),
+                )
+            except TelegramBadRequest as e:
+                if "message is not modified" not in str(e):
+                    raise
+
+        await state.update_data(last_render=[message.message_id, render_hash])
     except Exception as e:
         logger.error(f"Error rendering schedule: {str(e)}", exc_info=True)
         await message.answer("Failed to render schedule")
 
 
-async def _render_group_schedule(
-    message: Message,
-    user_id: int,
-    state: FSMContext,
-    notifyer: NotificationManager,
-    update: bool = False,
-) -> None:
+async def _build_group_schedule_text(
+    deep_links: DeepLinkService,
+    schedule: group_parser.Schedule,
+    current_tab: str,
+    current_week_index: int,
+    current_day_index: int,
+) -> str:
     """
-    Render group schedule with current state data.
+    Build group schedule text for the given view position.
     """
-    data = await state.get_data()
-    current_tab = data.get("current_tab")
-    current_week_index = data.get("current_week_index")
-    current_day_index = data.get("current_day_index")
-    schedule = data.get("schedule")
-    num_max_days = data.get("num_max_days")
-
     responses = []
     responses.append(
-        f"<a href='{await create_start_link(bot=message.bot, payload=schedule.group_name, encode=True)}'>{schedule.group_name}</a> {schedule.semester}"
+        f"<a href='{await deep_links.get(schedule.group_name)}'>{schedule.group_name}</a> {schedule.semester}"
     )
     if schedule.source == group_parser.SourceType.PROXY:
         responses.append(f"🔄 Расписание загружено из кэша")
@@ -202,41 +308,7 @@ async def _render_group_schedule(
     if current_tab == "basic" and schedule.weeks:
         week = schedule.weeks[current_week_index - 1]
         day = week.days[current_day_index - 1]
-
-        # Check if this is today, tomorrow, or yesterday
-        current_date = datetime.now()
-        current_weekday = current_date.weekday()
-        current_week_number = (
-            current_date.isocalendar()[1] % 2
-        )  # Get 0 or 1 for even/odd week
-
-        is_today = (current_week_number == (current_week_index - 1)) and DAYS_OF_WEEK[
-            current_weekday
-        ] == day.day_name
-        is_tomorrow = (
-            current_week_number == (current_week_index - 1)
-            and DAYS_OF_WEEK[(current_weekday + 1) % 7] == day.day_name
-        ) or (
-            current_week_number != (current_week_index - 1)
-            and current_weekday == 6
-            and DAYS_OF_WEEK[0] == day.day_name
-        )
-        is_yesterday = (
-            current_week_number == (current_week_index - 1)
-            and DAYS_OF_WEEK[(current_weekday - 1) % 7] == day.day_name
-        ) or (
-            current_week_number != (current_week_index - 1)
-            and current_weekday == 0
-            and DAYS_OF_WEEK[6] == day.day_name
-        )
-
-        day_suffix = ""
-        if is_today:
-            day_suffix = " (Сегодня)"
-        elif is_tomorrow:
-            day_suffix = " (Завтра)"
-        elif is_yesterday:
-            day_suffix = " (Вчера)"
+        day_suffix = _relative_day_suffix(day.day_name, current_week_index)
 
         responses.append(
             f"<b>{day.day_name}{day_suffix}</b> - <b>{week.week_number} Неделя</b>"
@@ -250,8 +322,8 @@ async def _render_group_schedule(
             lesson_text = [
                 f"{lesson.name.capitalize()}",
                 f"<b>{TIME_TO_EMOJI.get(lesson.time.split('-')[0].strip(), '')} {lesson.time}</b>{lesson_type_text}{lesson_subgroup_text}",
-                f"{_format_place(lesson.place.split(' / ')[1])} <a href='{MAPS_SEARCH_TEMPLATE.format(query=lesson.place.split(' / ')[0])}'>📍</a>",
-                f"<a href='{await create_start_link(bot=message.bot, payload=lesson.professor, encode=True)}'>{lesson.professor}</a>",
+                _format_lesson_place(lesson.place),
+                f"<a href='{await deep_links.get(lesson.professor)}'>{lesson.professor}</a>",
             ]
             responses.append("\n".join(lesson_text) + "\n")
 
@@ -260,20 +332,7 @@ async def _render_group_schedule(
         responses.append(f"")
         for day in schedule.session.days:
             # Get relative day label (вчера/сегодня/завтра)
-            day_suffix = ""
-            today = datetime.now().strftime("%A").lower()
-            if day.day_name.lower() == today:
-                day_suffix = " (Сегодня)"
-            elif (
-                day.day_name.lower()
-                == (datetime.now() + timedelta(days=1)).strftime("%A").lower()
-            ):
-                day_suffix = " (Завтра)"
-            elif (
-                day.day_name.lower()
-                == (datetime.now() - timedelta(days=1)).strftime("%A").lower()
-            ):
-                day_suffix = " (Вчера)"
+            day_suffix = _relative_date_suffix(day.day_name)
 
             responses.append(f"<b>{day.day_name}{day_suffix}:</b>")
             responses.append(f"")
@@ -286,115 +345,48 @@ async def _render_group_schedule(
                 lesson_text = [
                     f"{lesson.name.capitalize()}",
                     f"<b>{lesson.time}</b>{lesson_type_text}{lesson_subgroup_text}",
-                    f"{_format_place(lesson.place.split(' / ')[1])} <a href='{MAPS_SEARCH_TEMPLATE.format(query=lesson.place.split(' / ')[0])}'>📍</a>",
-                    f"<a href='{await create_start_link(bot=message.bot, payload=lesson.professor, encode=True)}'>{lesson.professor}</a>",
+                    _format_lesson_place(lesson.place),
+                    f"<a href='{await deep_links.get(lesson.professor)}'>{lesson.professor}</a>",
                 ]
                 responses.append("\n".join(lesson_text) + "\n")
     else:
         responses.append("Расписание занятий отсутствует")
 
-    subscribed = data.get("schedule").group_name in await notifyer.get_subscribed(
-        user_id
-    )
-    name = f"{data['schedule'].group_name if data['type'] == 'group' else data['schedule'].person_name}"
-    link = await create_start_link(message.bot, name, encode=True)
-
-    if not update:
-        await message.answer(
-            "\n".join(responses),
-            reply_markup=schedule_pagination_keyboard(
-                current_tab,
-                current_week_index,
-                current_day_index,
-                num_max_days,
-                "group",
-                subscribed,
-                link,
-            ),
-            parse_mode=ParseMode.HTML,
-            link_preview_options=LinkPreviewOptions(is_disabled=True),
-        )
-    else:
-        await message.edit_text(
-            "\n".join(responses),
-            reply_markup=schedule_pagination_keyboard(
-                current_tab,
-                current_week_index,
-                current_day_index,
-                num_max_days,
-                "group",
-                subscribed,
-                link,
-            ),
-            parse_mode=ParseMode.HTML,
-            link_preview_options=LinkPreviewOptions(is_disabled=True),
-        )
+    return "\n".join(responses)
 
 
-async def _render_professor_schedule(
-    message: Message,
-    user_id: int,
-    state: FSMContext,
-    notifyer: NotificationManager,
-    update: bool = False,
-) -> None:
+async def _build_professor_schedule_text(
+    deep_links: DeepLinkService,
+    schedule: professor_parser.Schedule,
+    current_tab: str,
+    current_week_index: int,
+    current_day_index: int,
+) -> str:
     """
-    Render professor schedule with current state data.
+    Build professor schedule text for the given view position.
     """
-    data = await state.get_data()
-    current_tab = data["current_tab"]
-    current_week_index = data["current_week_index"]
-    current_day_index = data["current_day_index"]
-    schedule = data["schedule"]
-    num_max_days = data["num_max_days"]
-
     responses = []
     responses.append(
-        f"<a href='{await create_start_link(bot=message.bot, payload=schedule.person_name, encode=True)}'>{schedule.person_name}</a> - {schedule.academic_year}"
+        f"<a href='{await deep_links.get(schedule.person_name)}'>{schedule.person_name}</a> - {schedule.academic_year}"
     )
     if schedule.source == professor_parser.SourceType.PROXY:
         responses.append(f"🔄 Расписание загружено из кэша")
 
     responses.append(f"")
 
+    async def _group_links(lesson) -> str:
+        # Create links for each group
+        groups = lesson.groups if isinstance(lesson.groups, list) else [lesson.groups]
+        group_links = []
+        for group in groups:
+            link = f"<a href='{await deep_links.get(group)}'>{group}</a>"
+            group_links.append(link)
+        return ", ".join(group_links)
+
     if current_tab == "basic" and schedule.weeks:
         week = schedule.weeks[current_week_index - 1]
         day = week.days[current_day_index - 1]
-
-        # Check if this is today, tomorrow, or yesterday
-        current_date = datetime.now()
-        current_weekday = current_date.weekday()
-        current_week_number = (
-            current_date.isocalendar()[1] % 2
-        )  # Get 0 or 1 for even/odd week
-
-        is_today = (current_week_number == (current_week_index - 1)) and DAYS_OF_WEEK[
-            current_weekday
-        ] == day.day_name
-        is_tomorrow = (
-            current_week_number == (current_week_index - 1)
-            and DAYS_OF_WEEK[(current_weekday + 1) % 7] == day.day_name
-        ) or (
-            current_week_number != (current_week_index - 1)
-            and current_weekday == 6
-            and DAYS_OF_WEEK[0] == day.day_name
-        )
-        is_yesterday = (
-            current_week_number == (current_week_index - 1)
-            and DAYS_OF_WEEK[(current_weekday - 1) % 7] == day.day_name
-        ) or (
-            current_week_number != (current_week_index - 1)
-            and current_weekday == 0
-            and DAYS_OF_WEEK[6] == day.day_name
-        )
-
-        day_suffix = ""
-        if is_today:
-            day_suffix = " (Сегодня)"
-        elif is_tomorrow:
-            day_suffix = " (Завтра)"
-        elif is_yesterday:
-            day_suffix = " (Вчера)"
+        day_suffix = _relative_day_suffix(day.day_name, current_week_index)
 
         responses.append(
             f"<b>{day.day_name}{day_suffix}</b> - <b>{week.week_number} Неделя</b>"
@@ -402,22 +394,13 @@ async def _render_professor_schedule(
         responses.append(f"")
 
         for lesson in day.lessons:
-            # Create links for each group
-            groups = (
-                lesson.groups if isinstance(lesson.groups, list) else [lesson.groups]
-            )
-            group_links = []
-            for group in groups:
-                link = f"<a href='{await create_start_link(bot=message.bot, payload=group, encode=True)}'>{group}</a>"
-                group_links.append(link)
-
             lesson_subgroup_text = f"  |  {lesson.subgroup}" if lesson.subgroup else ""
             lesson_type_text = f"  |  {lesson.type}" if lesson.type else ""
             responses.append(
                 f"{lesson.name.capitalize()}\n"
                 f"<b>{TIME_TO_EMOJI.get(lesson.time.split('-')[0].strip(), '')} {lesson.time}</b>{lesson_type_text}{lesson_subgroup_text}\n"
-                f"{_format_place(lesson.place.split(' / ')[1])} <a href='{MAPS_SEARCH_TEMPLATE.format(query=lesson.place.split(' / ')[0])}'>📍</a>\n"
-                f"{', '.join(group_links)}\n"
+                f"{_format_lesson_place(lesson.place)}\n"
+                f"{await _group_links(lesson)}\n"
             )
 
     elif current_tab == "consultations" and schedule.consultations:
@@ -426,35 +409,11 @@ async def _render_professor_schedule(
 
         for day in schedule.consultations.days:
             # Get relative day label (вчера/сегодня/завтра)
-            day_label = ""
-            today = datetime.now().strftime("%A").lower()
-            if day.day_name.lower() == today:
-                day_label = " (сегодня)"
-            elif (
-                day.day_name.lower()
-                == (datetime.now() + timedelta(days=1)).strftime("%A").lower()
-            ):
-                day_label = " (завтра)"
-            elif (
-                day.day_name.lower()
-                == (datetime.now() - timedelta(days=1)).strftime("%A").lower()
-            ):
-                day_label = " (вчера)"
+            day_label = _relative_date_suffix(day.day_name).lower()
 
             responses.append(f"<b>{day.day_name}{day_label}</b>")
             responses.append(f"")
             for lesson in day.lessons:
-                # Create links for each group
-                groups = (
-                    lesson.groups
-                    if isinstance(lesson.groups, list)
-                    else [lesson.groups]
-                )
-                group_links = []
-                for group in groups:
-                    link = f"<a href='{await create_start_link(bot=message.bot, payload=group, encode=True)}'>{group}</a>"
-                    group_links.append(link)
-
                 lesson_subgroup_text = (
                     f"  |  {lesson.subgroup}" if lesson.subgroup else ""
                 )
@@ -462,8 +421,8 @@ async def _render_professor_schedule(
                 responses.append(
                     f"{lesson.name.capitalize()}\n"
                     f"<b>{lesson.time}</b>{lesson_type_text}{lesson_subgroup_text}\n"
-                    f"{_format_place(lesson.place.split(' / ')[1])} <a href='{MAPS_SEARCH_TEMPLATE.format(query=lesson.place.split(' / ')[0])}'>📍</a>\n"
-                    f"{', '.join(group_links)}\n"
+                    f"{_format_lesson_place(lesson.place)}\n"
+                    f"{await _group_links(lesson)}\n"
                 )
 
     elif current_tab == "session" and schedule.session:
@@ -472,36 +431,12 @@ async def _render_professor_schedule(
 
         for day in schedule.session.days:
             # Get relative day label (вчера/сегодня/завтра)
-            day_suffix = ""
-            today = datetime.now().strftime("%A").lower()
-            if day.day_name.lower() == today:
-                day_suffix = " (Сегодня)"
-            elif (
-                day.day_name.lower()
-                == (datetime.now() + timedelta(days=1)).strftime("%A").lower()
-            ):
-                day_suffix = " (Завтра)"
-            elif (
-                day.day_name.lower()
-                == (datetime.now() - timedelta(days=1)).strftime("%A").lower()
-            ):
-                day_suffix = " (Вчера)"
+            day_suffix = _relative_date_suffix(day.day_name)
 
             responses.append(f"<b>{day.day_name}{day_suffix}:</b>")
             responses.append(f"")
 
             for lesson in day.lessons:
-                # Create links for each group
-                groups = (
-                    lesson.groups
-                    if isinstance(lesson.groups, list)
-                    else [lesson.groups]
-                )
-                group_links = []
-                for group in groups:
-                    link = f"<a href='{await create_start_link(bot=message.bot, payload=group, encode=True)}'>{group}</a>"
-                    group_links.append(link)
-
                 lesson_subgroup_text = (
                     f"  |  {lesson.subgroup}" if lesson.subgroup else ""
                 )
@@ -509,109 +444,124 @@ async def _render_professor_schedule(
                 responses.append(
                     f"{lesson.name.capitalize()}\n"
                     f"<b>{lesson.time}</b>{lesson_type_text}{lesson_subgroup_text}\n"
-                    f"{_format_place(lesson.place.split(' / ')[1])} <a href='{MAPS_SEARCH_TEMPLATE.format(query=lesson.place.split(' / ')[0])}'>📍</a>\n"
-                    f"{', '.join(group_links)}\n"
+                    f"{_format_lesson_place(lesson.place)}\n"
+                    f"{await _group_links(lesson)}\n"
                 )
     else:
         responses.append("Расписание занятий отсутствует")
 
-    subscribed = data.get("schedule").person_name in await notifyer.get_subscribed(
-        user_id
-    )
-    name = f"{data['schedule'].group_name if data['type'] == 'group' else data['schedule'].person_name}"
-    link = await create_start_link(message.bot, name, encode=True)
-    if not update:
-        await message.answer(
-            "\n".join(responses),
-            reply_markup=schedule_pagination_keyboard(
-                current_tab,
-                current_week_index,
-                current_day_index,
-                num_max_days,
-                "professor",
-                subscribed,
-                link,
-            ),
-            parse_mode=ParseMode.HTML,
-            link_preview_options=LinkPreviewOptions(is_disabled=True),
-        )
-    else:
-        await message.edit_text(
-            "\n".join(responses),
-            reply_markup=schedule_pagination_keyboard(
-                current_tab,
-                current_week_index,
-                current_day_index,
-                num_max_days,
-                "professor",
-                subscribed,
-                link,
-            ),
-            parse_mode=ParseMode.HTML,
-            link_preview_options=LinkPreviewOptions(is_disabled=True),
-        )
+    return "\n".join(responses)
 
 
-async def _calculate_current_day(schedule, week_number: int) -> Tuple[int, int, int]:
+def _calculate_current_day(
+    navigation: NavigationTable, week_number: int
+) -> Tuple[int, int, int]:
     """
-    Calculate the current day index based on schedule and week number.
+    Look up the current day index in the schedule's navigation table.
     Returns tuple of (current_day_index, num_max_days, week_number).
     """
-    if not schedule.weeks:
-        return 1, 1, week_number
-
-    available_days = [
-        day.day_name for day in schedule.weeks[week_number - 1].days if day.lessons
-    ]
-    num_max_days = len(available_days)
-    if num_max_days == 0:
-        return 1, 1, week_number
-
-    current_day_index = datetime.now().isoweekday() - 1
-    current_day_name = DAYS_OF_WEEK[current_day_index]
-
-    if current_day_name in available_days:
-        return available_days.index(current_day_name) + 1, num_max_days, week_number
-
-    # Find next available day
-    # First check remaining days in current week
-    for day in range(current_day_index + 1, 7):
-        if DAYS_OF_WEEK[day] in available_days:
-            return (
-                available_days.index(DAYS_OF_WEEK[day]) + 1,
-                num_max_days,
-                week_number,
-            )
+    return navigation.get_current_day(week_number, datetime.now().weekday())
+
+
+async def _stream_ai_job(chat_message: Message, ai_queue: AIJobQueue, job: AIJob) -> None:
+    """
+    Show the queue position of an AI job, then stream its answer into a message.
+    """
+    stream = StreamingMessage(
+        chat_message, min_interval=AI_STREAM_INTERVAL, parse_mode=ParseMode.MARKDOWN
+    )
+    try:
+        async with ChatActionSender.typing(bot=chat_message.bot, chat_id=chat_message.chat.id):
+            async for _ in job.updates():
+                if job.text:
+                    await stream.update(job.text)
+                elif not job.started:
+                    await stream.update(
+                        f"⏳ Запрос на AI-анализ в очереди, позиция: {ai_queue.position(job)}"
+                    )
 
-    # If not found, switch to next week and check from beginning
-    next_week = 2 if week_number == 1 else 1
-    next_week_days = [
-        day.day_name for day in schedule.weeks[next_week - 1].days if day.lessons
-    ]
+        if isinstance(job.error, asyncio.TimeoutError):
+            await stream.finish("AI не ответил вовремя, попробуйте позже")
+        elif job.error is not None or not job.text:
+            await stream.finish("Не удалось получить AI-анализ")
+        else:
+            await stream.finish(job.text)
+    except Exception as e:
+        logger.error(f"Error streaming AI summary: {e}")
 
-    if next_week_days:
-        return 1, len(next_week_days), next_week
 
-    # If still nothing found, return first available day in current week
-    return 1, num_max_days, week_number
+# Navigation taps that are folded into one message edit
+DEBOUNCED_ACTIONS = ("prev_day", "next_day", "swap_week")
 
 
 @user_router.callback_query(F.data, UserStates.in_group_schedule_view)
 @user_router.callback_query(F.data, UserStates.in_professor_schedule_view)
 async def process_callback(
-    callback: CallbackQuery, state: FSMContext, notifyer: NotificationManager
+    callback: CallbackQuery,
+    state: FSMContext,
+    notifyer: NotificationManager,
+    render_cache: RenderCache,
+    deep_links: DeepLinkService,
+    schedule_store: ScheduleStore,
+    debouncer: RenderDebouncer,
+    ai_queue: AIJobQueue,
+    summary_cache: SummaryCache,
+    calendar_client: CalendarClient,
+    export_jobs: ExportJobManager,
+    ics_cache: IcsCache,
+    throttle: Optional[Callable[[str], Awaitable[bool]]] = None,
 ) -> None:
     """
     Universal callback query handler for all keyboard actions.
+    throttle(operation) is set by ThrottlingMiddleware and charges expensive work.
+    """
+    # Debounced renders update state in the background, keep them apart from taps
+    async with debouncer.locked((callback.message.chat.id, callback.from_user.id)):
+        await _process_callback(
+            callback,
+            state,
+            notifyer,
+            render_cache,
+            deep_links,
+            schedule_store,
+            debouncer,
+            ai_queue,
+            summary_cache,
+            calendar_client,
+            export_jobs,
+            ics_cache,
+            throttle,
+        )
+
+
+async def _process_callback(
+    callback: CallbackQuery,
+    state: FSMContext,
+    notifyer: NotificationManager,
+    render_cache: RenderCache,
+    deep_links: DeepLinkService,
+    schedule_store: ScheduleStore,
+    debouncer: RenderDebouncer,
+    ai_queue: AIJobQueue,
+    summary_cache: SummaryCache,
+    calendar_client: CalendarClient,
+    export_jobs: ExportJobManager,
+    ics_cache: IcsCache,
+    throttle: Optional[Callable[[str], Awaitable[bool]]] = None,
+) -> None:
+    """
+    Apply a keyboard action to the user's state and rerender the schedule.
     """
     try:
         data = await state.get_data()
         action = callback.data
 
-        if not data:
+        entry = await _resolve_schedule(schedule_store, state, data) if data else None
+        if entry is None:
             logger.error("No state data found in callback handler")
             await callback.answer("Session expired, please restart", show_alert=True)
             return
+        schedule = entry.schedule
 
         if action == "nop":
             await callback.answer()
@@ -627,9 +577,7 @@ async def process_callback(
 
         elif action == "swap_week":
             data["current_week_index"] = 2 if data["current_week_index"] == 1 else 1
-            current_day_index, num_max_days, week_number = await _calculate_current_day(
-                data["schedule"], data["current_week_index"]
-            )
+            num_max_days = entry.navigation.get_num_days(data["current_week_index"])
             data["num_max_days"] = num_max_days
             data["current_day_index"] = min(data["current_day_index"], num_max_days)
             logger.debug(f"Swapped to week: {data['current_week_index']}")
@@ -644,8 +592,8 @@ async def process_callback(
                 new_current_day_index,
                 new_num_max_days,
                 new_week_number,
-            ) = await _calculate_current_day(
-                data["schedule"],
+            ) = _calculate_current_day(
+                entry.navigation,
                 current_week_number,  # Use current_week_number instead of data['current_week_index']
             )
 
@@ -656,6 +604,7 @@ async def process_callback(
                 no_rerender = True
 
             data["current_day_index"] = new_current_day_index
+            data["num_max_days"] = entry.navigation.get_num_days(current_week_number)
             data["current_week_index"] = (
                 current_week_number  # Use current_week_number instead of new_week_number
             )
@@ -671,25 +620,13 @@ async def process_callback(
             if new_day_index < 1:
                 # Switch to previous week's last day
                 data["current_week_index"] = 2 if data["current_week_index"] == 1 else 1
-                (
-                    current_day_index,
-                    num_max_days,
-                    week_number,
-                ) = await _calculate_current_day(
-                    data["schedule"], data["current_week_index"]
-                )
+                num_max_days = entry.navigation.get_num_days(data["current_week_index"])
                 data["num_max_days"] = num_max_days
                 data["current_day_index"] = num_max_days
             elif new_day_index > data["num_max_days"]:
                 # Switch to next week's first day
                 data["current_week_index"] = 2 if data["current_week_index"] == 1 else 1
-                (
-                    current_day_index,
-                    num_max_days,
-                    week_number,
-                ) = await _calculate_current_day(
-                    data["schedule"], data["current_week_index"]
-                )
+                num_max_days = entry.navigation.get_num_days(data["current_week_index"])
                 data["num_max_days"] = num_max_days
                 data["current_day_index"] = 1
             else:
@@ -697,13 +634,9 @@ async def process_callback(
                 logger.debug(f"Changed to day: {data['current_day_index']}")
 
         elif action == "notify_me":
-            schedule_id = (
-                data["schedule"].group_name
-                if data["type"] == "group"
-                else data["schedule"].person_name
-            )
-            is_subscribed = schedule_id in await notifyer.get_subscribed(
-                callback.from_user.id
+            schedule_id = entry.key
+            is_subscribed = await notifyer.is_subscribed(
+                callback.from_user.id, schedule_id
             )
 
             if is_subscribed:
@@ -719,161 +652,50 @@ async def process_callback(
             no_rerender = False  # need to rerender keyboard
 
         elif action == "ai_summary":
-            # Check if enough time has passed since last request
-            last_request_time = data.get("ai_request_delay")
-            current_time = datetime.now()
-
-            if last_request_time:
-                time_diff = (current_time - last_request_time).total_seconds()
-                TIMEOUT = 20
-                if time_diff < TIMEOUT:  # 20 seconds cooldown
-                    await callback.answer(
-                        f"Подождите {int(TIMEOUT - time_diff)} секунд перед следующим анализом",
-                        show_alert=True,
-                    )
-                    return
+            no_rerender = True
+            prompt = build_summary_prompt(
+                schedule,
+                data["type"],
+                data["current_tab"],
+                data["current_week_index"],
+                data["current_day_index"],
+            )
 
-            # Update last request time
-            data["ai_request_delay"] = current_time
-            await state.update_data(data)
+            # Students of one group ask about the same day, answer repeats without the LLM
+            cached_response = summary_cache.get(prompt)
+            if cached_response is not None:
+                await callback.message.answer(cached_response, parse_mode=ParseMode.MARKDOWN)
+                await callback.answer()
+                return
 
-            async with ChatActionSender.typing(
-                bot=callback.message.bot, chat_id=callback.message.chat.id
+            # Only new generations are charged, cached and joined summaries are free
+            if (
+                throttle is not None
+                and not ai_queue.in_flight(prompt)
+                and not ai_queue.user_busy(callback.from_user.id)
+                and not await throttle("ai")
             ):
-                no_rerender = True
-                schedule = data["schedule"]
-                current_tab = data["current_tab"]
-
-                # Prepare schedule text based on current tab and view
-                schedule_text = ""
-                if current_tab == "basic" and schedule.weeks:
-                    week = schedule.weeks[data["current_week_index"] - 1]
-                    day = week.days[data["current_day_index"] - 1]
-
-                    schedule_text = f"{day.day_name} - {week.week_number} Неделя\n\n"
-                    for lesson in day.lessons:
-                        if data["type"] == "group":
-                            professor_text = (
-                                f"{lesson.professor}\n"
-                                if hasattr(lesson, "professor")
-                                else ""
-                            )
-                            schedule_text += (
-                                f"{lesson.name}\n"
-                                f"{lesson.time} | {lesson.type if lesson.type else ''}\n"
-                                f"{lesson.place}\n"
-                                f"{professor_text}\n"
-                            )
-                        else:  # professor schedule
-                            groups = (
-                                lesson.groups
-                                if isinstance(lesson.groups, list)
-                                else [lesson.groups]
-                            )
-                            schedule_text += (
-                                f"{lesson.name}\n"
-                                f"{lesson.time} | {lesson.type if lesson.type else ''}\n"
-                                f"{lesson.place}\n"
-                                f"{', '.join(groups)}\n\n"
-                            )
-                elif current_tab == "session" and schedule.session:
-                    schedule_text = "Расписание сессии:\n\n"
-                    for day in schedule.session.days:
-                        schedule_text += f"{day.day_name}:\n"
-                        for lesson in day.lessons:
-                            professor_text = (
-                                f"{lesson.professor}\n"
-                                if hasattr(lesson, "professor")
-                                else ""
-                            )
-                            schedule_text += (
-                                f"{lesson.name}\n"
-                                f"{lesson.time} | {lesson.type if lesson.type else ''}\n"
-                                f"{lesson.place}\n"
-                                f"{professor_text}\n"
-                            )
-                elif (
-                    current_tab == "consultations"
-                    and hasattr(schedule, "consultations")
-                    and schedule.consultations
-                ):
-                    schedule_text = "Расписание консультаций:\n\n"
-                    for day in schedule.consultations.days:
-                        schedule_text += f"{day.day_name}:\n"
-                        for lesson in day.lessons:
-                            groups = (
-                                lesson.groups
-                                if isinstance(lesson.groups, list)
-                                else [lesson.groups]
-                            )
-                            schedule_text += (
-                                f"{lesson.name}\n"
-                                f"{lesson.time} | {lesson.type if lesson.type else ''}\n"
-                                f"{lesson.place}\n"
-                                f"{', '.join(groups)}\n\n"
-                            )
-
-                # if not schedule_text:
-                #     await callback.message.answer("Нет данных для анализа")
-                #     return
-
-                response = g4f.ChatCompletion.create(
-                    model=g4f.models.gpt_4,
-                    provider=g4f.Provider.Yqcloud,
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": request_template.format(schedule=schedule_text),
-                        }
-                    ],
-                    stream=True,
+                return
+
+            # Identical prompts in flight share one generation
+            try:
+                job = await ai_queue.submit(callback.from_user.id, entry.key, prompt)
+            except UserBusyError:
+                await callback.answer(
+                    "Дождитесь окончания предыдущего анализа", show_alert=True
                 )
-                msg = None
-                response_text = ""
-                chunk = ""
-                chunk_size = 100  # Update every ~100 characters
-
-                for message in response:
-                    if isinstance(message, str):
-                        chunk += message
-                        response_text += message
-
-                        # Only update when we have a substantial chunk of text
-                        if len(chunk) >= chunk_size:
-                            try:
-                                if msg is None:
-                                    msg = await callback.message.answer(
-                                        response_text, parse_mode=ParseMode.MARKDOWN
-                                    )
-                                else:
-                                    await msg.edit_text(
-                                        response_text, parse_mode=ParseMode.MARKDOWN
-                                    )
-                                chunk = ""  # Reset chunk after successful update
-                            except Exception as e:
-                                logger.debug(f"Failed to update message: {e}")
-                                continue
-
-                # Final update to ensure we show the complete message
-                if response_text:
-                    try:
-                        if msg is None:
-                            msg = await callback.message.answer(
-                                response_text, parse_mode=ParseMode.MARKDOWN
-                            )
-                        else:
-                            await msg.edit_text(
-                                response_text, parse_mode=ParseMode.MARKDOWN
-                            )
-                    except Exception as e:
-                        logger.debug(f"Failed to update final message: {e}")
+                return
+
+            await callback.answer()
+            # The answer streams in the background so the schedule stays usable meanwhile
+            ai_queue.watch(_stream_ai_job(callback.message, ai_queue, job))
+            return
 
         elif action == "get_calendar":
             # Check if enough time has passed since last calendar request
             calendar_request_time = data.get("calendar_request_delay")
             current_time = datetime.now()
             CALENDAR_TIMEOUT = 300  # 5 min seconds cooldown
-            CALENDAR_LOCK_TIMEOUT = 300  # 5 min seconds lock timeout
 
             if calendar_request_time:
                 time_diff = (current_time - calendar_request_time).total_seconds()
@@ -884,67 +706,81 @@ async def process_callback(
                     )
                     return
 
-            # Update last calendar request time
-            data["calendar_request_delay"] = current_time
-            await state.update_data(data)
-
-            schedule = data["schedule"]
             calendar_name = (
                 schedule.group_name if data["type"] == "group" else schedule.person_name
             )
+            # Requests for the same calendar and schedule version share one export,
+            # only new exports are charged
+            job_key = (calendar_name, entry.content_hash)
+            joined = export_jobs.running(job_key)
+            if not joined and throttle is not None and not await throttle("calendar"):
+                return
 
-            # Check global calendar lock
-            if calendar_locks[calendar_name]:
-                lock_time = calendar_locks[calendar_name]
-                if (current_time - lock_time).total_seconds() < CALENDAR_LOCK_TIMEOUT:
-                    await callback.answer(
-                        "Календарь уже создается другим пользователем. Пожалуйста, подождите минуту и попробуйте снова.",
-                        show_alert=True,
-                    )
-                    return
-
-            # Set global lock for this calendar
-            calendar_locks[calendar_name] = current_time
+            # Update last calendar request time
+            data["calendar_request_delay"] = current_time
+            await state.update_data(data)
 
-            no_rerender = True
             await callback.answer()
 
+            if joined:
+                initial_text = (
+                    "Этот календарь уже создается по запросу другого пользователя.\n\n"
+                    "Ссылка появится в этом сообщении, как только он будет готов."
+                )
+            else:
+                initial_text = (
+                    "Создание календаря...\n\n"
+                    + "⬜️" * PROGRESS_BAR_LENGTH
+                    + "\n\nПодготовка..."
+                )
+
             # Send initial progress message
-            progress_message = await callback.message.answer(
-                "Создание календаря...\n\n"
-                + "⬜️" * PROGRESS_BAR_LENGTH
-                + "\n\nПодготовка..."
+            progress_message = StreamingMessage(
+                callback.message,
+                min_interval=PROGRESS_INTERVAL,
+                message=await callback.message.answer(initial_text),
             )
+            job = export_jobs.submit(
+                calendar_name,
+                job_key,
+                partial(
+                    _create_google_calendar,
+                    calendar_client,
+                    calendar_name,
+                    schedule,
+                    data["type"],
+                    progress_message,
+                ),
+            )
+            # The export runs in the background so the schedule stays usable meanwhile
+            export_jobs.watch(_deliver_calendar(callback.message, progress_message, job))
+            return
 
-            async with ChatActionSender.typing(
-                bot=callback.message.bot, chat_id=callback.message.chat.id
-            ):
-                try:
-                    target_calendar = await _create_google_calendar(
-                        calendar_name, schedule, data["type"], progress_message
-                    )
-
-                    # Get shareable link
-                    calendar_link = f"https://calendar.google.com/calendar/u/0/r?cid={target_calendar.id}"
-
-                    await progress_message.edit_text(
-                        f"✅ Календарь успешно создан!\n\n"
-                        f"Ссылка на календарь: {calendar_link}\n\n"
-                        "Инструкция:\n"
-                        "1. Откройте ссылку\n"
-                        "2. Нажмите '+ Добавить календарь'\n"
-                        "3. Календарь появится в вашем списке\n\n"
-                        "Чтобы обновить календарь, нажмите на значок календаря 📅 еще раз"
-                    )
+        elif action == "get_ics":
+            calendar_name = (
+                schedule.group_name if data["type"] == "group" else schedule.person_name
+            )
+            ics_file = ics_cache.get(entry, data["type"], calendar_name)
+            await callback.answer()
 
-                except Exception as e:
-                    logger.error(f"Error creating calendar: {e}", exc_info=True)
-                    await progress_message.edit_text(
-                        "❌ Не удалось создать календарь. Попробуйте позже."
-                    )
-                finally:
-                    # Clear the lock when done
-                    calendar_locks[calendar_name] = None
+            try:
+                # Uploaded files are resent by id without uploading them again
+                sent = await callback.message.answer_document(
+                    ics_file.file_id
+                    or BufferedInputFile(ics_file.data, filename=ics_file.filename),
+                    caption=(
+                        "🗓 Расписание в формате .ics\n\n"
+                        "Откройте файл или импортируйте его в Google Календарь, "
+                        "Apple Календарь или Outlook"
+                    ),
+                )
+                if sent.document:
+                    ics_file.file_id = sent.document.file_id
+            except Exception as e:
+                logger.error(f"Error sending .ics file: {e}", exc_info=True)
+                await callback.message.answer("❌ Не удалось отправить файл. Попробуйте позже.")
+            # The callback is answered already, leave the schedule message as is
+            return
 
         await state.update_data(data)
 
@@ -957,13 +793,26 @@ async def process_callback(
             pass
 
         if not no_rerender:
-            await _render_schedule(
+            render = partial(
+                _render_schedule,
                 callback.message,
                 callback.from_user.id,
                 state,
                 notifyer=notifyer,
+                render_cache=render_cache,
+                deep_links=deep_links,
+                schedule_store=schedule_store,
                 update=True,
             )
+            if debouncer.window and action in DEBOUNCED_ACTIONS:
+                # Rapid taps only move the state, the message is edited once they stop
+                debouncer.schedule(
+                    (callback.message.chat.id, callback.message.message_id),
+                    (callback.message.chat.id, callback.from_user.id),
+                    render,
+                )
+            else:
+                await render()
 
     except Exception as e:
         logger.error(
@@ -972,11 +821,52 @@ async def process_callback(
         await callback.answer("Failed to process action", show_alert=True)
 
 
+def _format_changes(changes) -> List[str]:
+    """Format schedule changes into human-readable notification lines."""
+    change_messages = []
+    for change in changes:
+        if change.week_number:
+            change_messages.append(
+                f"Неделя {change.week_number}, {change.day_name}, {change.lesson_time}:\n"
+                f"  {change.field}: {change.old_value} -> {change.new_value}"
+            )
+        else:
+            change_messages.append(
+                f"Расписание сессии, {change.day_name}, {change.lesson_time}:\n"
+                f"  {change.field}: {change.old_value} -> {change.new_value}"
+            )
+    return change_messages
+
+
+async def _notify_subscribers(
+    notifyer: NotificationManager,
+    digest: NotificationDigest,
+    schedule_id: str,
+    title: str,
+    changes,
+) -> None:
+    """
+    Queue change notifications for every subscriber of a schedule.
+    """
+    subscribers = await notifyer.get_subscribers(schedule_id)
+    if not subscribers:
+        return
+
+    change_messages = _format_changes(changes)
+    for subscriber_id in subscribers:
+        await digest.add(subscriber_id, title, change_messages)
+
+
 async def _process_text(
     search_query: str,
     message: Message,
     search_results: SearchResultList,
     notifyer: NotificationManager,
+    digest: NotificationDigest,
+    render_cache: RenderCache,
+    deep_links: DeepLinkService,
+    schedule_store: ScheduleStore,
+    summary_cache: SummaryCache,
     state: FSMContext,
 ) -> None:
     """
@@ -1003,37 +893,14 @@ async def _process_text(
 
                 # Check for and notify about schedule changes
                 if schedule.source == group_parser.SourceType.CHANGED:
-                    change_messages = []
-                    for change in schedule.changes:
-                        if change.week_number:
-                            change_messages.append(
-                                f"Неделя {change.week_number}, {change.day_name}, {change.lesson_time}:\n"
-                                f"  {change.field}: {change.old_value} -> {change.new_value}"
-                            )
-                        else:
-                            change_messages.append(
-                                f"Расписание сессии, {change.day_name}, {change.lesson_time}:\n"
-                                f"  {change.field}: {change.old_value} -> {change.new_value}"
-                            )
-
-                    # Send notifications to all subscribers
-                    subscribers = await notifyer.get_subscribers(schedule.group_name)
-                    if subscribers:
-                        change_notification = (
-                            f"🔔 Обнаружены изменения в расписании группы {schedule.group_name}:\n\n"
-                            + "\n\n".join(change_messages)
-                        )
-                        for subscriber_id in subscribers:
-                            try:
-                                await message.bot.send_message(
-                                    chat_id=subscriber_id,
-                                    text=change_notification,
-                                    parse_mode=ParseMode.HTML,
-                                )
-                            except Exception as e:
-                                logger.error(
-                                    f"Failed to send notification to {subscriber_id}: {e}"
-                                )
+                    await _notify_subscribers(
+                        notifyer,
+                        digest,
+                        result.key,
+                        f"группы {schedule.group_name}",
+                        schedule.changes,
+                    )
+                    summary_cache.invalidate(result.key)
 
                 current_date = datetime.now()
                 current_week_ = current_date.isocalendar()[1]
@@ -1041,11 +908,12 @@ async def _process_text(
                     1 if current_week_ % 2 == 0 else 2
                 )  # 1 для четной недели, 2 для нечетной
 
+                entry = schedule_store.put(result.key, schedule)
                 (
                     current_day_index,
                     num_max_days,
                     week_number,
-                ) = await _calculate_current_day(schedule, week_is_even)
+                ) = _calculate_current_day(entry.navigation, week_is_even)
 
                 await state.set_state(UserStates.in_group_schedule_view)
                 await state.update_data(
@@ -1054,12 +922,18 @@ async def _process_text(
                     current_day_index=current_day_index,
                     max_weeks=len(schedule.weeks),
                     num_max_days=num_max_days,
-                    schedule=schedule,
+                    schedule_ref=entry.ref,
                     type="group",
                 )
 
                 await _render_schedule(
-                    message, message.from_user.id, state, notifyer=notifyer
+                    message,
+                    message.from_user.id,
+                    state,
+                    notifyer=notifyer,
+                    render_cache=render_cache,
+                    deep_links=deep_links,
+                    schedule_store=schedule_store,
                 )
 
             elif result.type == "professor":
@@ -1069,37 +943,14 @@ async def _process_text(
 
                 # Check for and notify about schedule changes
                 if schedule.source == professor_parser.SourceType.CHANGED:
-                    change_messages = []
-                    for change in schedule.changes:
-                        if change.week_number:
-                            change_messages.append(
-                                f"Неделя {change.week_number}, {change.day_name}, {change.lesson_time}:\n"
-                                f"  {change.field}: {change.old_value} -> {change.new_value}"
-                            )
-                        else:
-                            change_messages.append(
-                                f"Расписание сессии, {change.day_name}, {change.lesson_time}:\n"
-                                f"  {change.field}: {change.old_value} -> {change.new_value}"
-                            )
-
-                    # Send notifications to all subscribers
-                    subscribers = await notifyer.get_subscribers(schedule.person_name)
-                    if subscribers:
-                        change_notification = (
-                            f"🔔 Обнаружены изменения в расписании преподавателя {schedule.person_name}:\n\n"
-                            + "\n\n".join(change_messages)
-                        )
-                        for subscriber_id in subscribers:
-                            try:
-                                await message.bot.send_message(
-                                    chat_id=subscriber_id,
-                                    text=change_notification,
-                                    parse_mode=ParseMode.HTML,
-                                )
-                            except Exception as e:
-                                logger.error(
-                                    f"Failed to send notification to {subscriber_id}: {e}"
-                                )
+                    await _notify_subscribers(
+                        notifyer,
+                        digest,
+                        result.key,
+                        f"преподавателя {schedule.person_name}",
+                        schedule.changes,
+                    )
+                    summary_cache.invalidate(result.key)
 
                 current_date = datetime.now()
                 current_week_ = current_date.isocalendar()[1]
@@ -1107,11 +958,12 @@ async def _process_text(
                     1 if current_week_ % 2 == 0 else 2
                 )  # 1 для четной недели, 2 для нечетной
 
+                entry = schedule_store.put(result.key, schedule)
                 (
                     current_day_index,
                     num_max_days,
                     week_number,
-                ) = await _calculate_current_day(schedule, week_is_even)
+                ) = _calculate_current_day(entry.navigation, week_is_even)
 
                 await state.set_state(UserStates.in_professor_schedule_view)
                 await state.update_data(
@@ -1120,12 +972,18 @@ async def _process_text(
                     current_day_index=current_day_index,
                     max_weeks=len(schedule.weeks),
                     num_max_days=num_max_days,
-                    schedule=schedule,
+                    schedule_ref=entry.ref,
                     type="professor",
                 )
 
                 await _render_schedule(
-                    message, message.from_user.id, state, notifyer=notifyer
+                    message,
+                    message.from_user.id,
+                    state,
+                    notifyer=notifyer,
+                    render_cache=render_cache,
+                    deep_links=deep_links,
+                    schedule_store=schedule_store,
                 )
 
         except Exception as e:
@@ -1146,6 +1004,11 @@ async def process_cmd_start(
     command: CommandObject,
     search_results: SearchResultList,
     notifyer: NotificationManager,
+    digest: NotificationDigest,
+    render_cache: RenderCache,
+    deep_links: DeepLinkService,
+    schedule_store: ScheduleStore,
+    summary_cache: SummaryCache,
     state: FSMContext,
 ) -> None:
     """Handle /start command"""
@@ -1159,7 +1022,18 @@ async def process_cmd_start(
             return
 
         if payload:
-            await _process_text(payload, message, search_results, notifyer, state)
+            await _process_text(
+                payload,
+                message,
+                search_results,
+                notifyer,
+                digest,
+                render_cache,
+                deep_links,
+                schedule_store,
+                summary_cache,
+                state,
+            )
         else:
             await message.answer("Неверная ссылка: ссылка пустая")
     else:
@@ -1168,13 +1042,25 @@ async def process_cmd_start(
         )
 
 
+@user_router.inline_query()
+async def process_inline_query(
+    inline_query: InlineQuery, inline_search: InlineSearchService
+) -> None:
+    """Suggest groups and professors for '@bot <query>' in any chat"""
+    try:
+        results = await inline_search.search(inline_query.query)
+        await inline_query.answer(results, cache_time=300, is_personal=False)
+    except Exception as e:
+        logger.error(f"Error answering inline query '{inline_query.query}': {e}")
+
+
 @user_router.message(Command("help"))
-async def process_cmd_help(message: Message) -> None:
+async def process_cmd_help(message: Message, deep_links: DeepLinkService) -> None:
     """Handle /help command"""
     help_text = (
         "Как пользоваться ботом:\n\n"
         "1. Напишите название группы или фамилию преподавателя\n"
-        f'Например: <a href="{await create_start_link(bot=message.bot, payload="bpi2201", encode=True)}">bpi2201</a>, <a href="{await create_start_link(bot=message.bot, payload="тынченко вв", encode=True)}">тынченко вв</a>, <a href="{await create_start_link(bot=message.bot, payload="тынченко св", encode=True)}">тынченко св</a>\n\n'
+        f'Например: <a href="{await deep_links.get("bpi2201")}">bpi2201</a>, <a href="{await deep_links.get("тынченко вв")}">тынченко вв</a>, <a href="{await deep_links.get("тынченко св")}">тынченко св</a>\n\n'
         "2. В расписании доступны следующие функции:\n"
         "• Переключение между вкладками (Основное/Сессия/Консультации)\n"
         "• Переключение недель (Левый свитч х/2)\n"
@@ -1182,6 +1068,7 @@ async def process_cmd_help(message: Message) -> None:
         "• Кнопка открытия сегодняшнего дня (Кнопка между стрелками x/x)\n"
         "• Отслеживание изменений (Кнопка 🔔)\n"
         "• Получение ссылки на Google-календарь (Кнопка 📅)\n"
+        "• Скачать расписание для любого календаря (Кнопка 🗓)\n"
         "• AI-анализ расписания (Кнопка 📊)\n"
         "• Скопировать ссылку на расписание (Кнопка 🔁)\n\n"
         "3. Функция отслеживания (beta):\n"
@@ -1199,12 +1086,14 @@ async def process_cmd_help(message: Message) -> None:
         "• Получите ссылку на календарь с вашим расписанием\n"
         "• Календарь автоматически обновляется при изменениях\n"
         "• Синхронизируйте с телефоном или компьютером\n"
-        "• Доступны напоминания о парах\n\n"
+        "• Доступны напоминания о парах\n"
+        "• Кнопка 🗓 присылает файл .ics, который можно импортировать в любой календарь\n\n"
         "6. Быстрая навигация:\n"
         "• Нажимайте на названия групп в расписании преподавателя\n"
         "• Нажимайте на имена преподавателей в расписании группы\n"
         "• Нажимайте на 📍 чтобы открыть местоположение в 2GIS\n"
-        "• Ссылку можно сохранить, чтобы кликом открывать расписание\n\n"
+        "• Ссылку можно сохранить, чтобы кликом открывать расписание\n"
+        "• Напишите имя бота через @ и название группы в любом чате, чтобы поделиться расписанием\n\n"
         "Бот стремится автоматически показать текущий или ближайший следующий день при открытии расписания.\n\n"
     )
     await message.answer(
@@ -1220,159 +1109,145 @@ async def process_text(
     message: Message,
     search_results: SearchResultList,
     notifyer: NotificationManager,
+    digest: NotificationDigest,
+    render_cache: RenderCache,
+    deep_links: DeepLinkService,
+    schedule_store: ScheduleStore,
+    summary_cache: SummaryCache,
     state: FSMContext,
 ):
     """Handle text input"""
-    await _process_text(message.text, message, search_results, notifyer, state)
+    await _process_text(
+        message.text,
+        message,
+        search_results,
+        notifyer,
+        digest,
+        render_cache,
+        deep_links,
+        schedule_store,
+        summary_cache,
+        state,
+    )
+
 
+async def _deliver_calendar(
+    chat_message: Message,
+    progress_message: StreamingMessage,
+    job: asyncio.Task,
+) -> None:
+    """
+    Wait for a calendar export, possibly started by another user, and send its link.
+    """
+    async with ChatActionSender.typing(bot=chat_message.bot, chat_id=chat_message.chat.id):
+        try:
+            # Shielded, the export goes on for other requesters if this one is cancelled
+            calendar_id = await asyncio.shield(job)
+
+            # Get shareable link
+            calendar_link = f"https://calendar.google.com/calendar/u/0/r?cid={calendar_id}"
+
+            await progress_message.finish(
+                f"✅ Календарь успешно создан!\n\n"
+                f"Ссылка на календарь: {calendar_link}\n\n"
+                "Инструкция:\n"
+                "1. Откройте ссылку\n"
+                "2. Нажмите '+ Добавить календарь'\n"
+                "3. Календарь появится в вашем списке\n\n"
+                "Чтобы обновить календарь, нажмите на значок календаря 📅 еще раз"
+            )
 
-async def run_in_executor(func, *args, **kwargs):
-    """Helper function to run blocking code in executor."""
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, partial(func, *args, **kwargs))
+        except Exception as e:
+            logger.error(f"Error creating calendar: {e}", exc_info=True)
+            try:
+                await progress_message.finish(
+                    "❌ Не удалось создать календарь. Попробуйте позже."
+                )
+            except Exception as e:
+                logger.error(f"Error reporting calendar failure: {e}")
 
 
 async def _create_google_calendar(
-    calendar_name, schedule, schedule_type, progress_message
+    calendar_client, calendar_name, schedule, schedule_type, progress_message
 ):
-    """Asynchronous wrapper for Google Calendar operations."""
-    # Initialize Google Calendar
-
-    # Update progress
-    await _update_progress(progress_message, 0.1, "Инициализация календаря...")
+    """Export the regular schedule to a Google Calendar, returning its id."""
+    await _update_progress(progress_message, 0.2, "Поиск календаря...")
+
+    # Write only the events that changed since the last export
+    events = _build_calendar_events(schedule, schedule_type)
+    _, semester_end = semester_bounds(datetime.now())
+    for attempt in range(2):
+        calendar_id = await calendar_client.ensure_calendar(
+            calendar_name, description=f"Расписание {calendar_name}"
+        )
 
-    gc = await run_in_executor(
-        GoogleCalendar,
-        credentials_path=GOOGLE_CALENDAR_CREDS_PATH,
-        authentication_flow_port=8000,
+        await _update_progress(progress_message, 0.4, "Синхронизация расписания...")
+        try:
+            result = await calendar_client.sync_events(
+                calendar_id,
+                events,
+                # Also catch last semester's events, they are updated or removed.
+                # Lessons start in the future early in the semester, so list past its end
+                time_min=datetime.now() - timedelta(days=365),
+                time_max=semester_end + timedelta(days=1),
+                on_progress=partial(
+                    _update_call_progress,
+                    progress_message,
+                    0.4,
+                    1.0,
+                    "Синхронизация расписания...",
+                ),
+            )
+            break
+        except HttpError as e:
+            # The indexed calendar was deleted on the account, find or create it again
+            if e.status_code != 404 or attempt:
+                raise
+            logger.warning(f"Calendar {calendar_name} not found, refreshing index")
+            await calendar_client.forget_calendar(calendar_name)
+
+    logger.info(
+        f"Synced calendar {calendar_name}: {result.inserted} added, {result.updated} updated, "
+        f"{result.deleted} deleted, {result.unchanged} unchanged"
     )
 
-    await _update_progress(progress_message, 0.2, "Настройка параметров...")
+    await _update_progress(progress_message, 1.0, "Готово!")
 
-    # Set calendar settings
-    settings = await run_in_executor(gc.get_settings)
-    settings.format24_hour_time = True
-    settings.locale = "ru"
-    settings.timezone = "Asia/Krasnoyarsk"
+    return calendar_id
 
-    await _update_progress(progress_message, 0.3, "Создание календаря...")
 
-    # Find or create calendar
-    calendars = await run_in_executor(gc.get_calendar_list)
-    target_calendar = None
-    for calendar in calendars:
-        if calendar.summary == calendar_name:
-            target_calendar = calendar
-            break
+def _build_calendar_events(schedule, schedule_type) -> Dict[str, Event]:
+    """
+    Build recurring calendar events of the regular schedule.
+    Events are keyed by weekday, week parity, time, lesson and subgroup,
+    which stay the same between exports of the same schedule.
+    """
+    events = {}
+    for lesson in regular_lessons(schedule, schedule_type):
+        # Create recurrence rule (every 2 weeks)
+        recurrence = Recurrence.rule(freq=WEEKLY, interval=2, until=lesson.until)
+
+        # Set event times and adjust by -4 hours
+        events[lesson.key] = Event(
+            lesson.summary,
+            start=lesson.start - timedelta(hours=4),
+            end=lesson.end - timedelta(hours=4),
+            location=lesson.location,
+            recurrence=recurrence,
+        )
+    return events
 
-    if target_calendar is None:
-        calendar = Calendar(calendar_name, description=f"Расписание {calendar_name}")
-        target_calendar = await run_in_executor(gc.add_calendar, calendar)
-        logger.info(f"Created new calendar: {calendar_name}")
-    else:
-        logger.info(f"Using existing calendar: {calendar_name}")
 
+async def _update_call_progress(
+    message: StreamingMessage, start, end, status_text, done, total
+):
+    """Move progress bar between start and end as calendar calls finish."""
     await _update_progress(
-        progress_message, 0.5, "Очистка старых событий... ~30 секунд"
+        message, start + (end - start) * done / total, f"{status_text} {done}/{total}"
     )
 
-    # Clear existing events
-    events = await run_in_executor(gc.get_events, calendar_id=target_calendar.id)
-    for event in events:
-        await run_in_executor(gc.delete_event, event, calendar_id=target_calendar.id)
-    logger.info("Cleared existing events")
-
-    await _update_progress(progress_message, 0.7, "Добавление расписания... ~30 секунд")
-
-    # Add regular schedule events
-    if schedule.weeks:
-        # Determine semester dates
-        current_date = datetime.now()
-        if 9 <= current_date.month <= 12:  # First semester
-            semester_start = datetime(current_date.year, 9, 1)
-            semester_end = datetime(current_date.year, 12, 30)
-        else:  # Second semester
-            semester_start = datetime(current_date.year, 2, 10)
-            semester_end = datetime(current_date.year, 5, 31)
-
-        # Process each week's schedule
-        for week_idx, week in enumerate(schedule.weeks, 1):
-            for day in week.days:
-                # Get day of week index (0-6)
-                day_idx = list(DAYS_OF_WEEK.keys())[
-                    list(DAYS_OF_WEEK.values()).index(day.day_name)
-                ]
-
-                # Calculate first occurrence of this weekday in the semester
-                days_until = (day_idx - semester_start.weekday()) % 7
-                first_date = semester_start + timedelta(days=days_until)
-
-                # If this is second week's schedule, add 7 days
-                if week_idx != 2:
-                    first_date += timedelta(days=7)
-
-                for lesson in day.lessons:
-                    # Parse lesson time
-                    time_start, time_end = lesson.time.split("-")
-                    hour_start, minute_start = map(int, time_start.strip().split(":"))
-                    hour_end, minute_end = map(int, time_end.strip().split(":"))
-
-                    # Set event times and adjust by -4 hours
-                    event_start = first_date.replace(
-                        hour=hour_start, minute=minute_start
-                    ) - timedelta(hours=4)
-                    event_end = first_date.replace(
-                        hour=hour_end, minute=minute_end
-                    ) - timedelta(hours=4)
-
-                    # Create location string with combined info
-                    location_parts = []
-                    location_parts.append(_format_place(lesson.place.split(" / ")[1]))
-                    if lesson.type:
-                        location_parts.append(lesson.type)
-
-                    if schedule_type == "group":
-                        location_parts.append(lesson.professor)
-                    else:
-                        groups = (
-                            lesson.groups
-                            if isinstance(lesson.groups, list)
-                            else [lesson.groups]
-                        )
-                        location_parts.append(", ".join(groups))
-
-                    location = " | ".join(location_parts)
-
-                    # Create recurrence rule (every 2 weeks)
-                    recurrence = Recurrence.rule(
-                        freq=WEEKLY, interval=2, until=semester_end
-                    )
-
-                    # Create and add event
-                    event = Event(
-                        f"{lesson.name.capitalize()}{f' ({lesson.subgroup})' if lesson.subgroup else ''}",
-                        start=event_start,
-                        end=event_end,
-                        location=location,
-                        recurrence=recurrence,
-                    )
-                    await run_in_executor(
-                        gc.add_event, event, calendar_id=target_calendar.id
-                    )
-                    logger.info(
-                        f"Added event: {lesson.name} on {day.day_name} at {lesson.time} (Week {week_idx})"
-                    )
-
-    await _update_progress(progress_message, 1.0, "Готово!")
-
-    # Make calendar public
-    rule = AccessControlRule(role=ACLRole.READER, scope_type=ACLScopeType.DEFAULT)
-    await run_in_executor(gc.add_acl_rule, rule, calendar_id=target_calendar.id)
-
-    return target_calendar
-
 
-async def _update_progress(message, progress, status_text):
+async def _update_progress(message: StreamingMessage, progress, status_text):
     """Update progress bar message with random emojis."""
     filled = int(progress * PROGRESS_BAR_LENGTH)
     empty = PROGRESS_BAR_LENGTH - filled
@@ -1384,4 +1259,4 @@ async def _update_progress(message, progress, status_text):
     bar += "⬜️" * empty
 
     text = f"[{bar}]\n{status_text}"
-    await message.edit_text(text)
+    await message.update(text)
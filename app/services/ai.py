@@ -0,0 +1,355 @@
+"""
+AI provider module for schedule summaries.
+Runs blocking LLM clients on dedicated threads and streams their output
+to the event loop through an asyncio.Queue, and caches finished summaries.
+"""
+
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Iterable, Optional
+
+import g4f
+
+from services.schedule_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a stream in the chunk queue
+_END = object()
+
+
+request_template = """
+Ты - помощник для студентов и преподавателей, анализирующий расписание занятий и дающий полезные рекомендации.
+
+Вот расписание занятий на день, представленное в формате:
+
+<День недели> - <Номер недели>
+<Название предмета>
+<Номер пары> <Время начала> - <Время окончания> | <Тип занятия>
+<Место проведения>
+<ФИО преподавателя>/<Группы>
+
+{schedule}
+
+Проанализируй это расписание и предоставь результат в следующем формате:
+
+*Общий анализ:*
+
+•   Количество пар. / Количество предметов.
+•   Типы занятий (лекции, лабораторные, практики).
+•   Общее описание загрузки (насколько насыщенный день) + "Цвет дня (3 эмодзи нужного цвета по теме пар)" (4 и больше пар это красный цвет, 3 пары это оранжевый, 2 пары это желтый, 1 пара это зеленый)
+
+*Ключевые моменты:*
+
+•   Особое внимание обрати на пары, которые идут подряд по одному предмету, с разницей в 10-20 минут, если они есть. Отметь, что это может быть как плюсом, так и минусом
+•   Обрати внимание на перемещение между корпусами. Укажи, если есть такие перемещения, и на то, что нужно учитывать время на дорогу.
+•   Определи, есть ли какие-либо особенности в распределении типов занятий (например, все лабораторные утром, а лекции вечером).
+•   Отметь, если есть разрывы между занятиями, которые можно использовать для отдыха или самостоятельной работы.
+
+*Рекомендации (основанные на анализе расписания):*
+
+•   Дай практические советы по подготовке к конкретным типам занятий (например, заранее повторить теорию для лабораторных, подготовиться к практическим заданиям).
+•   Дай советы по управлению временем с учетом перемещений между корпусами.
+•   Предложи способы оптимизации дня (например, использовать разрывы между занятиями с пользой, приносить с собой воду и перекус).
+•   Дай общие советы по поддержанию продуктивности в течение дня.
+
+В анализе используй краткие, четкие и понятные формулировки, избегай сложных и пространных выражений.
+Направь анализ таким образом, чтобы он был максимально полезен и практичен для студента при это не душным, который будет это читать
+Используй эмоджи. (например цифры кубиками)
+"""
+
+
+def build_schedule_text(
+    schedule,
+    schedule_type: str,
+    current_tab: str,
+    current_week_index: int,
+    current_day_index: int,
+) -> str:
+    """
+    Build plain schedule text of the current tab and day for the AI prompt.
+    """
+    # Prepare schedule text based on current tab and view
+    schedule_text = ""
+    if current_tab == "basic" and schedule.weeks:
+        week = schedule.weeks[current_week_index - 1]
+        day = week.days[current_day_index - 1]
+
+        schedule_text = f"{day.day_name} - {week.week_number} Неделя\n\n"
+        for lesson in day.lessons:
+            if schedule_type == "group":
+                professor_text = (
+                    f"{lesson.professor}\n"
+                    if hasattr(lesson, "professor")
+                    else ""
+                )
+                schedule_text += (
+                    f"{lesson.name}\n"
+                    f"{lesson.time} | {lesson.type if lesson.type else ''}\n"
+                    f"{lesson.place}\n"
+                    f"{professor_text}\n"
+                )
+            else:  # professor schedule
+                groups = (
+                    lesson.groups
+                    if isinstance(lesson.groups, list)
+                    else [lesson.groups]
+                )
+                schedule_text += (
+                    f"{lesson.name}\n"
+                    f"{lesson.time} | {lesson.type if lesson.type else ''}\n"
+                    f"{lesson.place}\n"
+                    f"{', '.join(groups)}\n\n"
+                )
+    elif current_tab == "session" and schedule.session:
+        schedule_text = "Расписание сессии:\n\n"
+        for day in schedule.session.days:
+            schedule_text += f"{day.day_name}:\n"
+            for lesson in day.lessons:
+                professor_text = (
+                    f"{lesson.professor}\n"
+                    if hasattr(lesson, "professor")
+                    else ""
+                )
+                schedule_text += (
+                    f"{lesson.name}\n"
+                    f"{lesson.time} | {lesson.type if lesson.type else ''}\n"
+                    f"{lesson.place}\n"
+                    f"{professor_text}\n"
+                )
+    elif (
+        current_tab == "consultations"
+        and hasattr(schedule, "consultations")
+        and schedule.consultations
+    ):
+        schedule_text = "Расписание консультаций:\n\n"
+        for day in schedule.consultations.days:
+            schedule_text += f"{day.day_name}:\n"
+            for lesson in day.lessons:
+                groups = (
+                    lesson.groups
+                    if isinstance(lesson.groups, list)
+                    else [lesson.groups]
+                )
+                schedule_text += (
+                    f"{lesson.name}\n"
+                    f"{lesson.time} | {lesson.type if lesson.type else ''}\n"
+                    f"{lesson.place}\n"
+                    f"{', '.join(groups)}\n\n"
+                )
+
+    return schedule_text
+
+
+def build_summary_prompt(
+    schedule,
+    schedule_type: str,
+    current_tab: str,
+    current_week_index: int,
+    current_day_index: int,
+) -> str:
+    """
+    Build the AI prompt for the current tab and day.
+    """
+    return request_template.format(
+        schedule=build_schedule_text(
+            schedule, schedule_type, current_tab, current_week_index, current_day_index
+        )
+    )
+
+
+class AIProvider(ABC):
+    """
+    Streams a completion for a prompt.
+    """
+
+    @abstractmethod
+    def stream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Yield response text chunks as they arrive.
+        """
+
+    async def complete(self, prompt: str) -> str:
+        """
+        Get the whole response text.
+        """
+        return "".join([chunk async for chunk in self.stream(prompt)])
+
+    async def close(self) -> None:
+        """
+        Release provider resources.
+        """
+
+
+class ThreadedProvider(AIProvider):
+    """
+    Base for providers with a blocking streaming client.
+    Chunks are produced on a worker thread and consumed on the event loop,
+    so a slow model never blocks other handlers.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        timeout: float = 120,
+        chunk_timeout: float = 30,
+    ):
+        """
+        Initialize ThreadedProvider with number of concurrent generations,
+        total timeout and maximum wait between chunks in seconds.
+        """
+        self.timeout = timeout
+        self.chunk_timeout = chunk_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ai")
+
+    @abstractmethod
+    def _create_stream(self, prompt: str) -> Iterable[Any]:
+        """Start a blocking generation, returning an iterator over chunks"""
+
+    def _produce(
+        self,
+        prompt: str,
+        loop: asyncio.AbstractEventLoop,
+        queue: asyncio.Queue,
+        cancelled: threading.Event,
+    ) -> None:
+        """Read the blocking stream on a worker thread and hand chunks to the loop"""
+        try:
+            for chunk in self._create_stream(prompt):
+                if cancelled.is_set():
+                    break
+                # Providers also yield status objects, only text is forwarded
+                if isinstance(chunk, str):
+                    loop.call_soon_threadsafe(queue.put_nowait, chunk)
+            loop.call_soon_threadsafe(queue.put_nowait, _END)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        cancelled = threading.Event()
+        future = loop.run_in_executor(
+            self._executor, self._produce, prompt, loop, queue, cancelled
+        )
+        deadline = time.monotonic() + self.timeout
+
+        try:
+            while True:
+                wait = min(self.chunk_timeout, deadline - time.monotonic())
+                if wait <= 0:
+                    raise asyncio.TimeoutError
+                item = await asyncio.wait_for(queue.get(), wait)
+                if item is _END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Stops the worker after its next chunk if the consumer gave up
+            cancelled.set()
+            if not future.done():
+                future.add_done_callback(lambda f: f.exception())
+
+    async def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class G4FProvider(ThreadedProvider):
+    """
+    Free LLM access through g4f.
+    """
+
+    def __init__(self, model: Any = None, provider: Any = None, **kwargs: Any):
+        """
+        Initialize G4FProvider with g4f model and provider.
+        """
+        super().__init__(**kwargs)
+        self.model = model or g4f.models.gpt_4
+        self.provider = provider or g4f.Provider.Yqcloud
+
+    def _create_stream(self, prompt: str) -> Iterable[Any]:
+        return g4f.ChatCompletion.create(
+            model=self.model,
+            provider=self.provider,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+        )
+
+
+class StubProvider(AIProvider):
+    """
+    Offline provider answering with a canned summary, for local runs and tests.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        """
+        Initialize StubProvider with delay in seconds between streamed words.
+        """
+        self.delay = delay
+        self.calls = 0
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        self.calls += 1
+        text = f"*Общий анализ:*\n\n•   Тестовый ответ {prompt_hash(prompt)[:8]}"
+        for word in text.split(" "):
+            await asyncio.sleep(self.delay)
+            yield word + " "
+
+
+def prompt_hash(prompt: str) -> str:
+    """
+    Compute a short hash identifying a prompt.
+    """
+    return hashlib.blake2b(prompt.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class SummaryCache:
+    """
+    Finished AI responses keyed by prompt hash.
+    Prompts are built from the rendered day, so users viewing the same day share a summary.
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 24 * 3600):
+        """
+        Initialize SummaryCache with maximum number of responses and their lifetime in seconds.
+        """
+        self.ttl = ttl
+        # prompt hash -> (response, expiry time, schedule key)
+        self._entries = LRUCache(maxsize)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, prompt: str) -> Optional[str]:
+        """
+        Get a cached response for a prompt.
+        """
+        key = prompt_hash(prompt)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        response, expires_at, _ = entry
+        if time.time() >= expires_at:
+            self._entries.pop(key)
+            return None
+        return response
+
+    def put(self, schedule_key: str, prompt: str, response: str) -> None:
+        """
+        Store a finished response for a prompt about a schedule.
+        """
+        self._entries.put(prompt_hash(prompt), (response, time.time() + self.ttl, schedule_key))
+
+    def invalidate(self, schedule_key: str) -> None:
+        """
+        Drop all summaries of a schedule, e.g. after it changed upstream.
+        """
+        for key, (_, _, entry_schedule_key) in self._entries.items():
+            if entry_schedule_key == schedule_key:
+                self._entries.pop(key)
@@ -0,0 +1,152 @@
+"""
+AI batch module for precomputing summaries.
+Overnight, generates tomorrow's summaries of the most viewed schedules,
+so morning requests are answered from the summary cache.
+"""
+
+import asyncio
+import logging
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Iterable, Optional
+
+from services.ai import AIProvider, SummaryCache, build_summary_prompt
+from services.schedule_cache import CachedSchedule, ScheduleStore
+from services.search_results import parse_schedule_key
+
+logger = logging.getLogger(__name__)
+
+
+def build_day_prompt(entry: CachedSchedule, day: date) -> Optional[str]:
+    """
+    Build the prompt of the day a user opening the schedule on a given date sees first.
+    """
+    if not entry.schedule.weeks:
+        return None
+    schedule_type, _ = parse_schedule_key(entry.key)
+    week_is_even = 1 if day.isocalendar()[1] % 2 == 0 else 2
+    current_day_index, _, week_number = entry.navigation.get_current_day(
+        week_is_even, day.weekday()
+    )
+    return build_summary_prompt(
+        entry.schedule, schedule_type, "basic", week_number, current_day_index
+    )
+
+
+async def precompute_summaries(
+    schedule_store: ScheduleStore,
+    summary_cache: SummaryCache,
+    provider: AIProvider,
+    keys: Iterable[str],
+    day: date,
+    concurrency: int = 2,
+) -> int:
+    """
+    Generate and cache summaries of a day for schedules with given keys.
+    Returns the number of new summaries.
+    """
+    # prompt -> schedule key, schedules with the same day share one generation
+    prompts = {}
+    for key in keys:
+        entry = schedule_store.get_latest(key)
+        if entry is None:
+            continue
+        prompt = build_day_prompt(entry, day)
+        if prompt is not None and summary_cache.get(prompt) is None:
+            prompts.setdefault(prompt, key)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def precompute(prompt: str, key: str) -> bool:
+        async with semaphore:
+            try:
+                response = await provider.complete(prompt)
+            except Exception as e:
+                logger.error(f"Error precomputing AI summary for {key}: {e}")
+                return False
+        if not response:
+            return False
+        summary_cache.put(key, prompt, response)
+        return True
+
+    results = await asyncio.gather(
+        *(precompute(prompt, key) for prompt, key in prompts.items())
+    )
+    return sum(results)
+
+
+class SummaryPrecomputer:
+    """
+    Runs precompute_summaries for the upcoming day once a day.
+    """
+
+    def __init__(
+        self,
+        schedule_store: ScheduleStore,
+        summary_cache: SummaryCache,
+        provider: AIProvider,
+        top: int = 100,
+        concurrency: int = 2,
+        run_at: dt_time = dt_time(3, 0),
+    ):
+        """
+        Initialize SummaryPrecomputer with number of most viewed schedules to cover,
+        number of concurrent generations and local time of the daily run.
+        """
+        self.schedule_store = schedule_store
+        self.summary_cache = summary_cache
+        self.provider = provider
+        self.top = top
+        self.concurrency = concurrency
+        self.run_at = run_at
+        self._task: Optional[asyncio.Task] = None
+
+    async def run(self, day: Optional[date] = None) -> int:
+        """
+        Precompute summaries of a day for the most viewed schedules.
+        Defaults to the upcoming day: today before noon, tomorrow after.
+        """
+        day = day or (datetime.now() + timedelta(hours=12)).date()
+        keys = self.schedule_store.most_viewed(self.top)
+        count = await precompute_summaries(
+            self.schedule_store,
+            self.summary_cache,
+            self.provider,
+            keys,
+            day,
+            self.concurrency,
+        )
+        logger.info(f"Precomputed {count} AI summaries for {day} of {len(keys)} schedules")
+        return count
+
+    def _seconds_until_run(self) -> float:
+        """Time left until the next daily run"""
+        now = datetime.now()
+        next_run = datetime.combine(now.date(), self.run_at)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        return (next_run - now).total_seconds()
+
+    async def _loop(self) -> None:
+        """Sleep until the daily run, then precompute"""
+        while True:
+            await asyncio.sleep(self._seconds_until_run())
+            try:
+                await self.run()
+            except Exception as e:
+                logger.error(f"Error in AI summary precomputation: {e}")
+
+    def start(self) -> None:
+        """
+        Schedule the daily run.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self) -> None:
+        """
+        Stop the daily run.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
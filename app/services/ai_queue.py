@@ -0,0 +1,211 @@
+"""
+AI job queue module.
+Runs AI summaries on a fixed number of workers, takes turns between users
+and lets identical in-flight prompts share one generation.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import AsyncIterator, Coroutine, Deque, Dict, List, Optional, Set
+
+from services.ai import AIProvider, SummaryCache, prompt_hash
+
+logger = logging.getLogger(__name__)
+
+
+class UserBusyError(Exception):
+    """The user already waits for another AI summary"""
+
+
+class AIJob:
+    """
+    One generation watched by every user who asked for the same prompt.
+    """
+
+    def __init__(self, user_id: int, schedule_key: str, prompt: str):
+        self.user_id = user_id  # User who submitted the job
+        self.schedule_key = schedule_key
+        self.prompt = prompt
+        self.key = prompt_hash(prompt)
+        self.text = ""
+        self.started = False
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._version = 0
+        self._changed = asyncio.Condition()
+
+    async def _notify(self) -> None:
+        """Wake everyone watching the job"""
+        async with self._changed:
+            self._version += 1
+            self._changed.notify_all()
+
+    async def updates(self) -> AsyncIterator[None]:
+        """
+        Yield once now and again on every change until the job is done.
+        """
+        seen = -1
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: self._version != seen)
+                seen = self._version
+            yield
+            if self.done:
+                return
+
+
+class AIJobQueue:
+    """
+    Bounded pool of AI workers with round-robin scheduling across users.
+    """
+
+    def __init__(
+        self,
+        provider: AIProvider,
+        summary_cache: SummaryCache,
+        workers: int = 2,
+        max_jobs_per_user: int = 1,
+    ):
+        """
+        Initialize AIJobQueue with provider, cache for finished summaries, number of workers
+        and number of different prompts one user may have queued or running.
+        """
+        self.provider = provider
+        self.summary_cache = summary_cache
+        self.workers = workers
+        self.max_jobs_per_user = max_jobs_per_user
+        # user id -> jobs waiting in submission order
+        self._queues: Dict[int, Deque[AIJob]] = {}
+        # Users with waiting jobs, the first one is served next
+        self._turns: Deque[int] = deque()
+        # prompt hash -> queued or running job
+        self._in_flight: Dict[str, AIJob] = {}
+        self._available = asyncio.Condition()
+        self._workers: List[asyncio.Task] = []
+        # Background tasks streaming jobs to chats
+        self._watchers: Set[asyncio.Task] = set()
+
+    @property
+    def queued(self) -> int:
+        """Jobs waiting for a worker"""
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _ensure_workers(self) -> None:
+        """Start workers on first use, inside the running loop"""
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(self._work()) for _ in range(self.workers)
+            ]
+
+    def position(self, job: AIJob) -> int:
+        """
+        Place of a waiting job in the order workers will take them, starting from 1.
+        Returns 0 for jobs that are already running.
+        """
+        position = 1
+        depth = max((len(queue) for queue in self._queues.values()), default=0)
+        for round_index in range(depth):
+            for user_id in self._turns:
+                queue = self._queues[user_id]
+                if round_index < len(queue):
+                    if queue[round_index] is job:
+                        return position
+                    position += 1
+        return 0
+
+    def in_flight(self, prompt: str) -> bool:
+        """
+        Whether an identical prompt is queued or running, so a request would join it.
+        """
+        return prompt_hash(prompt) in self._in_flight
+
+    def user_busy(self, user_id: int) -> bool:
+        """
+        Whether a user already waits for max_jobs_per_user summaries.
+        """
+        user_jobs = sum(1 for other in self._in_flight.values() if other.user_id == user_id)
+        return user_jobs >= self.max_jobs_per_user
+
+    async def submit(self, user_id: int, schedule_key: str, prompt: str) -> AIJob:
+        """
+        Queue a prompt, or join the identical one already in flight.
+        Raises UserBusyError if the user already waits for max_jobs_per_user summaries.
+        """
+        self._ensure_workers()
+        job = self._in_flight.get(prompt_hash(prompt))
+        if job is not None:
+            return job
+
+        if self.user_busy(user_id):
+            raise UserBusyError
+
+        job = AIJob(user_id, schedule_key, prompt)
+        self._in_flight[job.key] = job
+        async with self._available:
+            if user_id not in self._queues:
+                self._queues[user_id] = deque()
+                self._turns.append(user_id)
+            self._queues[user_id].append(job)
+            self._available.notify()
+        return job
+
+    async def _take(self) -> AIJob:
+        """Wait for a job and pass the turn to the next user"""
+        async with self._available:
+            await self._available.wait_for(lambda: bool(self._turns))
+            user_id = self._turns.popleft()
+            queue = self._queues[user_id]
+            job = queue.popleft()
+            if queue:
+                self._turns.append(user_id)
+            else:
+                del self._queues[user_id]
+        return job
+
+    async def _notify_waiting(self) -> None:
+        """Positions moved, let waiting jobs refresh them"""
+        for queue in list(self._queues.values()):
+            for job in list(queue):
+                await job._notify()
+
+    async def _work(self) -> None:
+        """Run jobs one at a time"""
+        while True:
+            job = await self._take()
+            job.started = True
+            await job._notify()
+            await self._notify_waiting()
+            try:
+                async for chunk in self.provider.stream(job.prompt):
+                    job.text += chunk
+                    await job._notify()
+                if job.text:
+                    self.summary_cache.put(job.schedule_key, job.prompt, job.text)
+            except asyncio.CancelledError:
+                job.error = asyncio.CancelledError()
+                raise
+            except Exception as e:
+                logger.error(f"Error generating AI summary: {e}")
+                job.error = e
+            finally:
+                job.done = True
+                del self._in_flight[job.key]
+                await job._notify()
+
+    def watch(self, coro: Coroutine) -> None:
+        """
+        Run a coroutine that streams a job to a chat in the background.
+        """
+        task = asyncio.create_task(coro)
+        self._watchers.add(task)
+        task.add_done_callback(self._watchers.discard)
+
+    async def close(self) -> None:
+        """
+        Stop workers and watchers.
+        """
+        for task in [*self._workers, *self._watchers]:
+            task.cancel()
+        await asyncio.gather(*self._workers, *self._watchers, return_exceptions=True)
+        self._workers = []
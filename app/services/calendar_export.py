@@ -0,0 +1,293 @@
+"""
+Calendar export module.
+Turns schedules into calendar lessons shared by the Google Calendar sync
+and the .ics file export, and caches generated .ics files.
+"""
+
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from services.schedule_cache import DAYS_OF_WEEK, CachedSchedule, LRUCache
+
+# Timezone lesson times are given in
+SCHEDULE_TIMEZONE = ZoneInfo("Asia/Krasnoyarsk")
+# Session entries only have a start time
+SESSION_LESSON_DURATION = timedelta(minutes=90)
+
+ICS_PRODID = "-//pallada_tgbot//Schedule//RU"
+# Maximum line length in octets, longer lines are folded
+ICS_LINE_LENGTH = 75
+
+
+@dataclass
+class CalendarLesson:
+    """
+    One calendar event, recurring every two weeks until `until` if set.
+    Times are local to SCHEDULE_TIMEZONE, without tzinfo.
+    """
+    key: str  # Stable between exports of the same schedule
+    summary: str
+    start: datetime
+    end: datetime
+    location: str
+    until: Optional[datetime] = None
+
+
+def format_place(place: str) -> str:
+    """Format place string from 'корп. "Н" каб. "205"' to 'Н-205'"""
+    try:
+        # Extract values in quotes using string operations
+        parts = place.split('"')
+        if len(parts) >= 4:  # Ensure we have both building and room
+            building = parts[1].strip()
+            room = parts[3].strip()
+            return f"{building}-{room}"
+        return place  # Return original if can't parse
+    except Exception:
+        return place  # Return original if any error occurs
+
+
+def semester_bounds(current_date: datetime) -> Tuple[datetime, datetime]:
+    """
+    Get start and end of the semester a date falls into.
+    """
+    if 9 <= current_date.month <= 12:  # First semester
+        return datetime(current_date.year, 9, 1), datetime(current_date.year, 12, 30)
+    # Second semester
+    return datetime(current_date.year, 2, 10), datetime(current_date.year, 5, 31)
+
+
+def _lesson_location(lesson: Any, schedule_type: str) -> str:
+    """Short place, lesson type and professor or groups"""
+    location_parts = [format_place(lesson.place.split(" / ")[-1])]
+    if lesson.type:
+        location_parts.append(lesson.type)
+
+    if schedule_type == "group":
+        location_parts.append(lesson.professor)
+    else:
+        groups = lesson.groups if isinstance(lesson.groups, list) else [lesson.groups]
+        location_parts.append(", ".join(groups))
+
+    return " | ".join(location_parts)
+
+
+def _lesson_summary(lesson: Any) -> str:
+    """Capitalized lesson name with subgroup"""
+    return f"{lesson.name.capitalize()}{f' ({lesson.subgroup})' if lesson.subgroup else ''}"
+
+
+def regular_lessons(
+    schedule: Any, schedule_type: str, current_date: Optional[datetime] = None
+) -> List[CalendarLesson]:
+    """
+    Build recurring lessons of the regular schedule for the current semester.
+    Lessons are keyed by weekday, week parity, time and subgroup.
+    """
+    lessons: List[CalendarLesson] = []
+    if not schedule.weeks:
+        return lessons
+
+    semester_start, semester_end = semester_bounds(current_date or datetime.now())
+    keys = set()
+    for week_idx, week in enumerate(schedule.weeks, 1):
+        for day in week.days:
+            # Get day of week index (0-6)
+            day_idx = list(DAYS_OF_WEEK.keys())[
+                list(DAYS_OF_WEEK.values()).index(day.day_name)
+            ]
+
+            # Calculate first occurrence of this weekday in the semester
+            days_until = (day_idx - semester_start.weekday()) % 7
+            first_date = semester_start + timedelta(days=days_until)
+
+            # If this is second week's schedule, add 7 days
+            if week_idx != 2:
+                first_date += timedelta(days=7)
+
+            for lesson in day.lessons:
+                # Parse lesson time
+                time_start, time_end = lesson.time.split("-")
+                hour_start, minute_start = map(int, time_start.strip().split(":"))
+                hour_end, minute_end = map(int, time_end.strip().split(":"))
+
+                # Without the lesson name, so a renamed lesson keeps its key
+                key = f"{day_idx}:{week_idx}:{lesson.time}:{lesson.subgroup or ''}"
+                # Several lessons in one slot, e.g. electives in different rooms
+                duplicate = 1
+                while key in keys:
+                    duplicate += 1
+                    key = f"{key.rsplit('#', 1)[0]}#{duplicate}"
+                keys.add(key)
+
+                lessons.append(
+                    CalendarLesson(
+                        key=key,
+                        summary=_lesson_summary(lesson),
+                        start=first_date.replace(hour=hour_start, minute=minute_start),
+                        end=first_date.replace(hour=hour_end, minute=minute_end),
+                        location=_lesson_location(lesson, schedule_type),
+                        until=semester_end,
+                    )
+                )
+    return lessons
+
+
+def session_lessons(schedule: Any, schedule_type: str) -> List[CalendarLesson]:
+    """
+    Build one-off lessons of the session schedule.
+    Days whose name is not a date like '9.01.2025' are skipped.
+    """
+    lessons: List[CalendarLesson] = []
+    if not schedule.session:
+        return lessons
+
+    for day in schedule.session.days:
+        try:
+            date = datetime.strptime(day.day_name, "%d.%m.%Y")
+        except ValueError:
+            continue
+        for index, lesson in enumerate(day.lessons):
+            try:
+                hour, minute = map(int, lesson.time.split("-")[0].strip().split(":"))
+            except ValueError:
+                continue
+            start = date.replace(hour=hour, minute=minute)
+            lessons.append(
+                CalendarLesson(
+                    key=f"session:{day.day_name}:{lesson.time}:{index}",
+                    summary=_lesson_summary(lesson),
+                    start=start,
+                    end=start + SESSION_LESSON_DURATION,
+                    location=_lesson_location(lesson, schedule_type),
+                )
+            )
+    return lessons
+
+
+def _ics_time(value: datetime) -> str:
+    """Local schedule time as an iCalendar UTC timestamp"""
+    utc = value.replace(tzinfo=SCHEDULE_TIMEZONE).astimezone(timezone.utc)
+    return utc.strftime("%Y%m%dT%H%M%SZ")
+
+
+def _ics_escape(text: str) -> str:
+    """Escape an iCalendar text value"""
+    return (
+        text.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\n", "\\n")
+    )
+
+
+def _ics_fold(line: str) -> str:
+    """Fold a content line into chunks of at most ICS_LINE_LENGTH octets"""
+    chunks = []
+    current = ""
+    limit = ICS_LINE_LENGTH
+    for char in line:
+        if len((current + char).encode("utf-8")) > limit:
+            chunks.append(current)
+            current = ""
+            # Continuation lines start with a space
+            limit = ICS_LINE_LENGTH - 1
+        current += char
+    chunks.append(current)
+    return "\r\n ".join(chunks)
+
+
+def build_ics(
+    calendar_name: str,
+    schedule_key: str,
+    lessons: List[CalendarLesson],
+    created_at: Optional[datetime] = None,
+) -> bytes:
+    """
+    Build an iCalendar file with one event per lesson.
+    Event UIDs are derived from lesson keys and the sequence grows with every
+    generated file, so calendar apps that match events by UID update them in
+    place when the file is imported again.
+    """
+    created_at = created_at or datetime.now(timezone.utc)
+    stamp = created_at.strftime("%Y%m%dT%H%M%SZ")
+    # Newer files must carry a higher sequence to replace imported events
+    sequence = int(created_at.timestamp()) // 60
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{ICS_PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_ics_escape(calendar_name)}",
+        f"X-WR-TIMEZONE:{SCHEDULE_TIMEZONE.key}",
+    ]
+    for lesson in lessons:
+        uid = hashlib.blake2b(
+            f"{schedule_key}:{lesson.key}".encode("utf-8"), digest_size=16
+        ).hexdigest()
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{uid}@pallada-tgbot",
+            f"DTSTAMP:{stamp}",
+            f"SEQUENCE:{sequence}",
+            f"DTSTART:{_ics_time(lesson.start)}",
+            f"DTEND:{_ics_time(lesson.end)}",
+        ]
+        if lesson.until is not None:
+            lines.append(f"RRULE:FREQ=WEEKLY;INTERVAL=2;UNTIL={_ics_time(lesson.until)}")
+        lines += [
+            f"SUMMARY:{_ics_escape(lesson.summary)}",
+            f"LOCATION:{_ics_escape(lesson.location)}",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(_ics_fold(line) for line in lines) + "\r\n").encode("utf-8")
+
+
+@dataclass
+class IcsFile:
+    """Generated .ics file, with Telegram file id once uploaded"""
+    filename: str
+    data: bytes
+    file_id: Optional[str] = None
+
+
+class IcsCache:
+    """
+    Generated .ics files keyed by schedule content hash and semester.
+    Once a file is uploaded, repeat requests resend it by Telegram file id.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        """
+        Initialize IcsCache with maximum number of files.
+        """
+        self._files = LRUCache(maxsize)
+
+    def get(
+        self,
+        entry: CachedSchedule,
+        schedule_type: str,
+        calendar_name: str,
+        current_date: Optional[datetime] = None,
+    ) -> IcsFile:
+        """
+        Get the .ics file of a schedule, generating it on a miss.
+        """
+        current_date = current_date or datetime.now()
+        semester_start, _ = semester_bounds(current_date)
+        cache_key = f"{entry.ref}:{schedule_type}:{semester_start:%Y%m%d}"
+        ics_file = self._files.get(cache_key)
+        if ics_file is None:
+            lessons = regular_lessons(entry.schedule, schedule_type, current_date)
+            lessons += session_lessons(entry.schedule, schedule_type)
+            ics_file = IcsFile(
+                filename=f"{calendar_name}.ics",
+                data=build_ics(calendar_name, entry.key, lessons),
+            )
+            self._files.put(cache_key, ics_file)
+        return ics_file
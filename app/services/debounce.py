@@ -0,0 +1,93 @@
+"""
+Debounce module for coalescing rapid navigation taps.
+State changes from every tap are applied at once, while the message is
+edited only after taps stop for a short window.
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable, Set
+
+logger = logging.getLogger(__name__)
+
+
+class RenderDebouncer:
+    """
+    Delays message renders and runs only the last one requested within a window.
+    Renders and state updates of one user are serialized by a per-user lock.
+    """
+
+    def __init__(self, window: float = 0.3):
+        """
+        Initialize RenderDebouncer with debounce window in seconds (0 renders immediately).
+        """
+        self.window = window
+        # user key -> [lock, number of holders and waiters]
+        self._locks: Dict[Hashable, list] = {}
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        # Renders still waiting out the window, safe to cancel
+        self._sleeping: Set[asyncio.Task] = set()
+        self.coalesced = 0
+
+    @asynccontextmanager
+    async def locked(self, user_key: Hashable) -> AsyncIterator[None]:
+        """
+        Hold the user's lock while reading and writing their state.
+        """
+        entry = self._locks.setdefault(user_key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[user_key]
+
+    async def _run(
+        self,
+        message_key: Hashable,
+        user_key: Hashable,
+        render: Callable[[], Awaitable[None]],
+    ) -> None:
+        """Wait out the window, then render with the user's latest state"""
+        try:
+            await asyncio.sleep(self.window)
+        finally:
+            self._sleeping.discard(asyncio.current_task())
+
+        try:
+            async with self.locked(user_key):
+                await render()
+        except Exception as e:
+            logger.error(f"Error in debounced render: {e}")
+        finally:
+            if self._tasks.get(message_key) is asyncio.current_task():
+                del self._tasks[message_key]
+
+    def schedule(
+        self,
+        message_key: Hashable,
+        user_key: Hashable,
+        render: Callable[[], Awaitable[None]],
+    ) -> None:
+        """
+        Request a render of a message, replacing a pending one for the same message.
+        """
+        pending = self._tasks.get(message_key)
+        if pending in self._sleeping:
+            pending.cancel()
+            self._sleeping.discard(pending)
+            self.coalesced += 1
+
+        task = asyncio.create_task(self._run(message_key, user_key, render))
+        self._sleeping.add(task)
+        self._tasks[message_key] = task
+
+    async def close(self) -> None:
+        """
+        Wait for pending renders to finish.
+        """
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
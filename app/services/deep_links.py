@@ -0,0 +1,60 @@
+"""
+Deep link module for generating 't.me/<bot>?start=...' links.
+Memoizes encoded links per payload so rendering does not recompute them.
+"""
+
+import logging
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.utils.deep_linking import create_deep_link
+
+from services.schedule_cache import LRUCache
+from services.search_results import SearchResultList
+
+logger = logging.getLogger(__name__)
+
+
+class DeepLinkService:
+    """
+    Creates and caches encoded start links for schedule payloads.
+    """
+
+    def __init__(self, bot: Bot, maxsize: int = 16384):
+        """
+        Initialize DeepLinkService with bot and maximum number of cached links.
+        """
+        self.bot = bot
+        self._username: Optional[str] = None
+        self._cache = LRUCache(maxsize)
+
+    async def _get_username(self) -> str:
+        """Fetch bot username once"""
+        if self._username is None:
+            self._username = (await self.bot.me()).username
+        return self._username
+
+    def _create(self, payload: str) -> str:
+        """Encode payload into a start link and remember it"""
+        link = create_deep_link(self._username, "start", payload, encode=True)
+        self._cache.put(payload, link)
+        return link
+
+    async def get(self, payload: str) -> str:
+        """
+        Get start link for a payload.
+        """
+        link = self._cache.get(payload)
+        if link is None:
+            await self._get_username()
+            link = self._create(payload)
+        return link
+
+    async def warm(self, search_results: SearchResultList) -> None:
+        """
+        Precompute links for every group and professor name.
+        """
+        await self._get_username()
+        for record in search_results.results:
+            self._create(record['name'])
+        logger.info(f"Warmed {len(self._cache)} deep links")
@@ -0,0 +1,106 @@
+"""
+Export jobs module for long-running calendar exports.
+Requests for an export that is already running join it and get the same
+result, exports of one calendar run one at a time, and the number of
+exports running at once is bounded.
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Coroutine, Dict, Hashable, Set
+
+logger = logging.getLogger(__name__)
+
+
+class ExportJobManager:
+    """
+    Deduplicated, bounded background exports.
+    Finished jobs and unused locks are dropped as soon as they are no longer needed.
+    """
+
+    def __init__(self, max_concurrency: int = 2):
+        """
+        Initialize ExportJobManager with number of exports running at once.
+        """
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # job key -> running or waiting export
+        self._jobs: Dict[Hashable, asyncio.Task] = {}
+        # lock key -> [lock, number of holders and waiters]
+        self._locks: Dict[Hashable, list] = {}
+        # Background tasks delivering results to chats
+        self._watchers: Set[asyncio.Task] = set()
+        self.joined = 0
+
+    def running(self, job_key: Hashable) -> bool:
+        """
+        Whether a job is waiting or running.
+        """
+        return job_key in self._jobs
+
+    @asynccontextmanager
+    async def _locked(self, lock_key: Hashable) -> AsyncIterator[None]:
+        """Hold the lock of a key, dropping it once nobody needs it"""
+        entry = self._locks.setdefault(lock_key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[lock_key]
+
+    async def _run(
+        self, lock_key: Hashable, export: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Run an export once its key and a slot are free"""
+        async with self._locked(lock_key):
+            async with self._semaphore:
+                return await export()
+
+    def _finished(self, job_key: Hashable, task: asyncio.Task) -> None:
+        """Prune a finished job"""
+        if self._jobs.get(job_key) is task:
+            del self._jobs[job_key]
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Export {job_key} failed: {task.exception()}")
+
+    def submit(
+        self,
+        lock_key: Hashable,
+        job_key: Hashable,
+        export: Callable[[], Awaitable[Any]],
+    ) -> asyncio.Task:
+        """
+        Start an export, or join the one with the same job key already in flight.
+        Exports with the same lock key, e.g. of one calendar, never run concurrently.
+        Await the returned task through asyncio.shield, so a requester giving up
+        does not cancel the export for the others.
+        """
+        task = self._jobs.get(job_key)
+        if task is None:
+            task = asyncio.create_task(self._run(lock_key, export))
+            self._jobs[job_key] = task
+            task.add_done_callback(lambda done: self._finished(job_key, done))
+        else:
+            self.joined += 1
+        return task
+
+    def watch(self, coro: Coroutine) -> None:
+        """
+        Run a coroutine that delivers an export to a chat in the background.
+        """
+        task = asyncio.create_task(coro)
+        self._watchers.add(task)
+        task.add_done_callback(self._watchers.discard)
+
+    async def close(self) -> None:
+        """
+        Cancel running exports and watchers.
+        """
+        tasks = [*self._jobs.values(), *self._watchers]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,166 @@
+"""
+Persistent FSM storage module.
+Keeps user states and schedule-view data in SQLite so sessions survive
+restarts and can be shared by several bot processes on one host.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fsm (
+    key TEXT PRIMARY KEY,
+    state TEXT,
+    data TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_fsm_updated_at ON fsm (updated_at);
+"""
+
+
+def _encode(value: Any) -> Any:
+    """Encode values that JSON does not support natively"""
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    """Restore values encoded by _encode"""
+    if len(obj) == 1 and "$dt" in obj:
+        return datetime.fromisoformat(obj["$dt"])
+    return obj
+
+
+def dumps(data: Any) -> str:
+    """
+    Serialize state data to compact JSON.
+    """
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=_encode)
+
+
+def loads(raw: str) -> Any:
+    """
+    Deserialize state data produced by dumps.
+    """
+    return json.loads(raw, object_hook=_decode)
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    FSM storage backed by a SQLite database with expiry of idle sessions.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "database/fsm.sqlite3",
+        ttl: Optional[float] = 7 * 24 * 3600,
+        purge_interval: float = 3600,
+    ):
+        """
+        Initialize SQLiteStorage with database path and idle session lifetime in seconds.
+        """
+        self.db_path = Path(db_path)
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._last_purge = 0.0
+        # Single worker thread keeps all access to the connection serialized
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fsm-db")
+        self._closed = False
+
+    async def _run(self, func, *args):
+        """Run a blocking database call on the dedicated thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args))
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the connection and create the schema on first use"""
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _cutoff(self) -> float:
+        """Oldest update time of a live session"""
+        return time.time() - self.ttl if self.ttl else 0.0
+
+    def _purge(self) -> None:
+        """Delete expired sessions at most once per purge interval"""
+        now = time.time()
+        if not self.ttl or now - self._last_purge < self.purge_interval:
+            return
+        self._last_purge = now
+        with self._conn:
+            cursor = self._conn.execute("DELETE FROM fsm WHERE updated_at < ?", (self._cutoff(),))
+        if cursor.rowcount:
+            logger.info(f"Purged {cursor.rowcount} expired FSM sessions")
+
+    def _read(self, key: str, column: str) -> Optional[str]:
+        row = self._connect().execute(
+            f"SELECT {column} FROM fsm WHERE key = ? AND updated_at >= ?",
+            (key, self._cutoff()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def _write(self, key: str, column: str, value: Optional[str]) -> None:
+        # The other column of an expired session must not come back to life
+        other = "data" if column == "state" else "state"
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                f"INSERT INTO fsm (key, {column}, updated_at) VALUES (?, ?, ?) "
+                f"ON CONFLICT (key) DO UPDATE SET {column} = excluded.{column}, "
+                f"{other} = CASE WHEN fsm.updated_at < ? THEN NULL ELSE fsm.{other} END, "
+                f"updated_at = excluded.updated_at",
+                (key, value, time.time(), self._cutoff()),
+            )
+            conn.execute(
+                "DELETE FROM fsm WHERE key = ? AND state IS NULL AND data IS NULL", (key,)
+            )
+        self._purge()
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        value = state.state if isinstance(state, State) else state
+        await self._run(self._write, self.key_builder.build(key), "state", value)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return await self._run(self._read, self.key_builder.build(key), "state")
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        value = dumps(dict(data)) if data else None
+        await self._run(self._write, self.key_builder.build(key), "data", value)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        raw = await self._run(self._read, self.key_builder.build(key), "data")
+        return loads(raw) if raw else {}
+
+    async def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        await self._run(self._close)
+        self._executor.shutdown(wait=False)
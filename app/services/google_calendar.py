@@ -0,0 +1,336 @@
+"""
+Google Calendar client module.
+Runs calendar API calls on a bounded thread pool, with one authenticated
+client per thread, and retries rate limits and server errors with
+exponential backoff. Calendars are synced incrementally by stable event keys
+and found by name through a persisted name -> calendar id index.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import pickle
+import random
+import threading
+import types
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import aiofiles
+import aiofiles.os
+from gcsa.acl import AccessControlRule, ACLRole, ACLScopeType
+from gcsa.calendar import Calendar
+from gcsa.event import Event
+from gcsa.google_calendar import GoogleCalendar
+from gcsa.serializers.event_serializer import EventSerializer
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from googleapiclient.errors import HttpError
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying: rate limits and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Reasons of 403 responses that are rate limits rather than permission errors
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+# Private extended properties of synced events
+SYNC_KEY_PROPERTY = "schedule_key"
+SYNC_HASH_PROPERTY = "schedule_hash"
+
+# (method name, args, kwargs) of one GoogleCalendar call
+CalendarCall = Tuple[str, tuple, Dict[str, Any]]
+
+
+@dataclass
+class SyncResult:
+    """
+    Changes made by a calendar sync.
+    """
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+
+
+def event_hash(event: Event) -> str:
+    """
+    Hash of an event's content, without its id and extended properties.
+    """
+    body = EventSerializer.to_json(event)
+    body.pop("id", None)
+    body.pop("extendedProperties", None)
+    data = json.dumps(body, sort_keys=True, default=str)
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _sync_properties(event: Event) -> Dict[str, str]:
+    """Private extended properties of an event"""
+    return event.other.get("extendedProperties", {}).get("private", {})
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Whether a failed call may succeed if repeated"""
+    if isinstance(error, HttpError):
+        if error.status_code in RETRY_STATUSES:
+            return True
+        if error.status_code == 403 and isinstance(error.error_details, list):
+            return any(
+                isinstance(detail, dict) and detail.get("reason") in RATE_LIMIT_REASONS
+                for detail in error.error_details
+            )
+        return False
+    # Connection resets, timeouts and SSL errors
+    return isinstance(error, OSError)
+
+
+class CalendarClient:
+    """
+    Concurrent access to the Google Calendar API.
+    The underlying HTTP client is not thread-safe, so every pool thread builds
+    its own GoogleCalendar on first use. All of them share one set of credentials,
+    refreshed and saved to the token file by one thread at a time.
+    """
+
+    def __init__(
+        self,
+        credentials_path: str,
+        index_path: str = "database/calendars.json",
+        max_workers: int = 8,
+        max_retries: int = 5,
+        backoff: float = 1.0,
+        max_backoff: float = 32.0,
+    ):
+        """
+        Initialize CalendarClient with credentials, calendar index file, number of
+        concurrent API calls, retries per call and initial and maximum delay
+        between retries in seconds.
+        """
+        self.credentials_path = credentials_path
+        # gcsa keeps the token next to the client secret
+        self.token_path = Path(credentials_path).with_name("token.pickle")
+        self._credentials: Optional[Credentials] = None
+        self._credentials_lock = threading.Lock()
+        self.index_path = Path(index_path)
+        # calendar name -> calendar id
+        self._index: Optional[Dict[str, str]] = None
+        self._index_lock = asyncio.Lock()
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gcal")
+        self._local = threading.local()
+        self.retries = 0
+
+    def _save_token(self) -> None:
+        """Write refreshed credentials to the token file atomically"""
+        tmp_path = self.token_path.with_suffix(self.token_path.suffix + ".tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(self._credentials, f)
+            os.replace(tmp_path, self.token_path)
+        except Exception as e:
+            logger.error(f"Error saving calendar token: {e}")
+
+    def _shared_credentials(self) -> Credentials:
+        """Credentials of all pool threads, loaded once and refreshed before expiry"""
+        with self._credentials_lock:
+            if self._credentials is None:
+                # Loads the saved token, refreshing it or running the authentication flow
+                self._credentials = GoogleCalendar(
+                    credentials_path=self.credentials_path,
+                    token_path=str(self.token_path),
+                    authentication_flow_port=8000,
+                ).credentials
+            elif self._credentials.expired and self._credentials.refresh_token:
+                # Refreshed here, so request threads never refresh it concurrently
+                self._credentials.refresh(Request())
+                self._save_token()
+            return self._credentials
+
+    def _client(self) -> GoogleCalendar:
+        """Client of the current pool thread"""
+        credentials = self._shared_credentials()
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = GoogleCalendar(credentials=credentials)
+            self._local.client = client
+        return client
+
+    def _invoke(self, method: str, args: tuple, kwargs: Dict[str, Any]) -> Any:
+        """Run a GoogleCalendar method on a pool thread"""
+        result = getattr(self._client(), method)(*args, **kwargs)
+        # Listing methods page lazily, fetch every page while still on the pool thread
+        if isinstance(result, types.GeneratorType):
+            result = list(result)
+        return result
+
+    async def call(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        """
+        Call a GoogleCalendar method, retrying transient errors.
+        """
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await loop.run_in_executor(
+                    self._executor, self._invoke, method, args, kwargs
+                )
+            except Exception as e:
+                if attempt == self.max_retries or not _is_retryable(e):
+                    raise
+                # Full jitter keeps concurrent calls from retrying in lockstep
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+                logger.warning(f"Calendar {method} failed ({e}), retrying in {delay:.1f}s")
+                self.retries += 1
+                await asyncio.sleep(delay)
+
+    async def call_many(
+        self,
+        calls: Sequence[CalendarCall],
+        on_progress: Optional[Callable[[int, int], Any]] = None,
+    ) -> List[Any]:
+        """
+        Run calls concurrently, at most max_workers at a time.
+        on_progress(done, total) is awaited after each finished call.
+        Raises the first error once all calls have finished.
+        """
+        done = 0
+
+        async def run(call: CalendarCall) -> Any:
+            nonlocal done
+            method, args, kwargs = call
+            try:
+                return await self.call(method, *args, **kwargs)
+            finally:
+                done += 1
+                if on_progress is not None:
+                    await on_progress(done, len(calls))
+
+        results = await asyncio.gather(*(run(call) for call in calls), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+
+    async def sync_events(
+        self,
+        calendar_id: str,
+        events: Dict[str, Event],
+        time_min: Optional[datetime] = None,
+        time_max: Optional[datetime] = None,
+        on_progress: Optional[Callable[[int, int], Any]] = None,
+    ) -> SyncResult:
+        """
+        Make a calendar contain exactly the given events, keyed by stable keys.
+        Only changed events are written, an unchanged calendar costs one list call.
+        Events without a key, e.g. from older exports, are deleted.
+        Existing events are listed between time_min and time_max, which must cover
+        every given event, otherwise events outside the window are added again.
+        """
+        result = SyncResult()
+        hashes = {}
+        for key, event in events.items():
+            hashes[key] = event_hash(event)
+            event.other["extendedProperties"] = {
+                "private": {SYNC_KEY_PROPERTY: key, SYNC_HASH_PROPERTY: hashes[key]}
+            }
+
+        existing = await self.call(
+            "get_events", calendar_id=calendar_id, time_min=time_min, time_max=time_max
+        )
+        calls: List[CalendarCall] = []
+        seen = set()
+        for event in existing:
+            properties = _sync_properties(event)
+            key = properties.get(SYNC_KEY_PROPERTY)
+            if key not in events or key in seen:
+                calls.append(("delete_event", (event,), {"calendar_id": calendar_id}))
+                result.deleted += 1
+                continue
+            seen.add(key)
+            if properties.get(SYNC_HASH_PROPERTY) == hashes[key]:
+                result.unchanged += 1
+                continue
+            events[key].event_id = event.id
+            calls.append(("update_event", (events[key],), {"calendar_id": calendar_id}))
+            result.updated += 1
+
+        for key, event in events.items():
+            if key not in seen:
+                calls.append(("add_event", (event,), {"calendar_id": calendar_id}))
+                result.inserted += 1
+
+        await self.call_many(calls, on_progress)
+        return result
+
+    async def _read_index(self) -> Dict[str, str]:
+        """Read the calendar index file"""
+        try:
+            async with aiofiles.open(self.index_path, "r") as f:
+                content = await f.read()
+                return json.loads(content) if content else {}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.error(f"Error reading calendar index: {e}")
+            return {}
+
+    async def _write_index(self) -> None:
+        """Write the calendar index file atomically via a temporary file"""
+        tmp_path = self.index_path.with_suffix(self.index_path.suffix + ".tmp")
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            async with aiofiles.open(tmp_path, "w") as f:
+                await f.write(json.dumps(self._index, ensure_ascii=False, separators=(",", ":")))
+            await aiofiles.os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            logger.error(f"Error writing calendar index: {e}")
+
+    async def ensure_calendar(self, name: str, description: Optional[str] = None) -> str:
+        """
+        Get the id of the calendar named name, creating a public one if there is none.
+        The calendar list is only fetched when the name is missing from the index.
+        """
+        if self._index is not None and name in self._index:
+            return self._index[name]
+
+        async with self._index_lock:
+            if self._index is None:
+                self._index = await self._read_index()
+            if name in self._index:
+                return self._index[name]
+
+            # Index miss: the calendar may have been created elsewhere, refresh it
+            calendars = await self.call("get_calendar_list")
+            for calendar in calendars:
+                self._index.setdefault(calendar.summary, calendar.id)
+
+            if name not in self._index:
+                calendar = await self.call("add_calendar", Calendar(name, description=description))
+                rule = AccessControlRule(role=ACLRole.READER, scope_type=ACLScopeType.DEFAULT)
+                await self.call("add_acl_rule", rule, calendar_id=calendar.id)
+                self._index[name] = calendar.id
+                logger.info(f"Created new calendar: {name}")
+
+            await self._write_index()
+            return self._index[name]
+
+    async def forget_calendar(self, name: str) -> None:
+        """
+        Drop a calendar from the index, e.g. after it was deleted on the account.
+        """
+        async with self._index_lock:
+            if self._index is not None and self._index.pop(name, None) is not None:
+                await self._write_index()
+
+    async def close(self) -> None:
+        """
+        Release pool threads.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
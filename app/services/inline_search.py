@@ -0,0 +1,93 @@
+"""
+Inline search module for '@bot <query>' suggestions in any chat.
+Matches groups and professors by name prefix with a fuzzy fallback
+and caches built answers per normalized query.
+"""
+
+import logging
+from typing import List
+
+from aiogram.types import (
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    InlineQueryResultArticle,
+    InputTextMessageContent,
+)
+
+from services.deep_links import DeepLinkService
+from services.schedule_cache import LRUCache
+from services.search_results import SearchResult, SearchResultList, normalize_name
+
+logger = logging.getLogger(__name__)
+
+# Telegram shows at most 50 inline results
+MAX_RESULTS = 50
+# Shorter queries match too many names for a fuzzy scan to be useful
+MIN_FUZZY_QUERY_LENGTH = 3
+
+TYPE_TITLES = {
+    "group": "Группа",
+    "professor": "Преподаватель",
+}
+
+
+class InlineSearchService:
+    """
+    Builds inline query answers for schedule search.
+    """
+
+    def __init__(
+        self,
+        search_results: SearchResultList,
+        deep_links: DeepLinkService,
+        maxsize: int = 4096,
+    ):
+        """
+        Initialize InlineSearchService with search data and maximum number of cached queries.
+        """
+        self.search_results = search_results
+        self.deep_links = deep_links
+        self._cache = LRUCache(maxsize)
+
+    def warm(self) -> None:
+        """
+        Build search indexes before the first query arrives.
+        """
+        self.search_results.search_by_prefix("")
+
+    def _find(self, query: str) -> List[SearchResult]:
+        """Prefix matches, or fuzzy matches when nothing starts with the query"""
+        results = self.search_results.search_by_prefix(query, MAX_RESULTS)
+        if not results and len(query) >= MIN_FUZZY_QUERY_LENGTH:
+            results = self.search_results.search_fuzzy(query, MAX_RESULTS)
+        return results
+
+    async def _build_article(self, result: SearchResult) -> InlineQueryResultArticle:
+        """Build a shareable message with a link that opens the schedule"""
+        link = await self.deep_links.get(result.name)
+        type_title = TYPE_TITLES.get(result.type, result.type)
+        return InlineQueryResultArticle(
+            id=result.key,
+            title=result.name,
+            description=type_title,
+            input_message_content=InputTextMessageContent(
+                message_text=f"📅 Расписание: {result.name} ({type_title.lower()})\n{link}",
+            ),
+            reply_markup=InlineKeyboardMarkup(
+                inline_keyboard=[[InlineKeyboardButton(text="Открыть расписание", url=link)]]
+            ),
+        )
+
+    async def search(self, query: str) -> List[InlineQueryResultArticle]:
+        """
+        Get inline results for a query.
+        """
+        normalized = normalize_name(query)
+        if not normalized:
+            return []
+
+        articles = self._cache.get(normalized)
+        if articles is None:
+            articles = [await self._build_article(result) for result in self._find(normalized)]
+            self._cache.put(normalized, articles)
+        return articles
@@ -0,0 +1,120 @@
+"""
+Notification digest module for batching schedule change notifications.
+Buffers changes per user over a time window and sends them as one message.
+"""
+
+import asyncio
+import logging
+from typing import Dict, List
+
+from aiogram import Bot
+from aiogram.enums import ParseMode
+
+logger = logging.getLogger(__name__)
+
+# Telegram message length limit
+MAX_MESSAGE_LENGTH = 4096
+
+
+class NotificationDigest:
+    """
+    Collects schedule change notifications per user and delivers them in digests.
+    With a zero window every notification is sent immediately.
+    """
+
+    def __init__(self, bot: Bot, window: float = 0):
+        """
+        Initialize NotificationDigest with bot and buffering window in seconds.
+        """
+        self.bot = bot
+        self.window = window
+        self._pending: Dict[int, Dict[str, List[str]]] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    @property
+    def enabled(self) -> bool:
+        """Whether notifications are buffered into digests"""
+        return self.window > 0
+
+    async def add(self, user_id: int, title: str, changes: List[str]) -> None:
+        """
+        Queue changes of one schedule for a user.
+        """
+        if not self.enabled:
+            await self._send(user_id, {title: changes})
+            return
+
+        sections = self._pending.setdefault(user_id, {})
+        sections.setdefault(title, []).extend(changes)
+
+        if user_id not in self._tasks:
+            self._tasks[user_id] = asyncio.create_task(self._flush_later(user_id))
+
+    async def flush(self, user_id: int) -> None:
+        """
+        Send all buffered changes for a user as one digest.
+        """
+        sections = self._pending.pop(user_id, None)
+        if sections:
+            await self._send(user_id, sections)
+
+    async def close(self) -> None:
+        """
+        Cancel pending timers and deliver everything that is still buffered.
+        """
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+
+        for user_id in list(self._pending):
+            await self.flush(user_id)
+
+    async def _flush_later(self, user_id: int) -> None:
+        """Wait for the digest window to pass and flush the user's buffer"""
+        try:
+            await asyncio.sleep(self.window)
+        finally:
+            self._tasks.pop(user_id, None)
+        await self.flush(user_id)
+
+    async def _send(self, user_id: int, sections: Dict[str, List[str]]) -> None:
+        """Send sections to a user, splitting by Telegram message length"""
+        blocks = [
+            f"🔔 Обнаружены изменения в расписании {title}:\n\n" + "\n\n".join(changes)
+            for title, changes in sections.items()
+        ]
+
+        for text in _pack_blocks(blocks):
+            try:
+                await self.bot.send_message(
+                    chat_id=user_id,
+                    text=text,
+                    parse_mode=ParseMode.HTML,
+                )
+            except Exception as e:
+                logger.error(f"Failed to send notification to {user_id}: {e}")
+
+
+def _pack_blocks(blocks: List[str]) -> List[str]:
+    """Join blocks into as few messages as possible without exceeding the length limit"""
+    messages = []
+    current = ""
+
+    for block in blocks:
+        while len(block) > MAX_MESSAGE_LENGTH:
+            if current:
+                messages.append(current)
+                current = ""
+            messages.append(block[:MAX_MESSAGE_LENGTH])
+            block = block[MAX_MESSAGE_LENGTH:]
+
+        candidate = f"{current}\n\n{block}" if current else block
+        if len(candidate) > MAX_MESSAGE_LENGTH:
+            messages.append(current)
+            current = block
+        else:
+            current = candidate
+
+    if current:
+        messages.append(current)
+    return messages
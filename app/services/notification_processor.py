@@ -1,34 +1,118 @@
 """
 Notification processor module for managing user subscriptions to schedules.
-Handles subscription storage and retrieval using a JSON-based database.
+Keeps subscriptions indexed in memory by schedule key ('group:643') and
+persists them to a JSON-based database with batched write-behind flushes.
+The JSON database belongs to a single process, use the SQLite backend to
+run several bot processes.
 """
 
 import json
+import asyncio
+import fcntl
 import aiofiles
+import aiofiles.os
 import logging
-from typing import List, Dict
+from typing import List, Dict, Set, Optional, Iterable, Tuple
 from pathlib import Path
 
+from services.search_results import SearchResultList
+
 logger = logging.getLogger(__name__)
 
+DB_FORMAT_VERSION = 2
+
+
+def migrate_legacy_subscriptions(
+    legacy: Dict[str, List[str]], search_results: Optional[SearchResultList]
+) -> Tuple[Dict[str, Set[int]], Dict[str, List[str]]]:
+    """
+    Convert the legacy {user_id: [display names]} format to {schedule key: {user ids}}.
+    Names shared by several schedules subscribe the user to all of them.
+    Names that cannot be resolved, e.g. without search results, are returned
+    as {user_id: [names]} so the migration can be retried instead of dropping them.
+    """
+    schedules: Dict[str, Set[int]] = {}
+    unresolved: Dict[str, List[str]] = {}
+    if search_results is None:
+        logger.error("Cannot migrate legacy subscriptions without search results")
+        return schedules, {user_id: list(names) for user_id, names in legacy.items()}
+
+    for user_id_str, names in legacy.items():
+        for name in names:
+            keys = search_results.get_keys_by_name(name)
+            if not keys:
+                logger.warning(f"Cannot resolve subscription of {user_id_str} to schedule {name}")
+                unresolved.setdefault(user_id_str, []).append(name)
+            elif len(keys) > 1:
+                logger.warning(f"Ambiguous schedule name {name}, subscribing {user_id_str} to {keys}")
+            for key in keys:
+                schedules.setdefault(key, set()).add(int(user_id_str))
+    return schedules, unresolved
+
+
 class NotificationManager:
     """
     Manages user subscriptions to schedules.
     """
 
-    def __init__(self, db_path: str = "database/users.json"):
+    def __init__(
+        self,
+        db_path: str = "database/users.json",
+        flush_interval: float = 5.0,
+        search_results: Optional[SearchResultList] = None,
+    ):
         """
-        Initialize NotificationManager with database path.
+        Initialize NotificationManager with database path and write-behind delay in seconds.
+        Search results are used to migrate subscriptions stored under display names.
         """
         self.db_path = Path(db_path)
+        self.flush_interval = flush_interval
+        self.search_results = search_results
         self._ensure_file_exists()
 
+        self._user_index: Dict[int, Set[str]] = {}  # user -> schedules
+        self._schedule_index: Dict[str, Set[int]] = {}  # schedule -> subscribers
+        self._loaded = False
+        self._dirty = False
+        # user id -> legacy schedule names not migrated yet, retried on every start
+        self._pending: Dict[str, List[str]] = {}
+        self._lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._closing = asyncio.Event()
+        self._lock_file = None
+        self._acquire_process_lock()
+
     def _ensure_file_exists(self) -> None:
         """Create the JSON file if it doesn't exist"""
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         if not self.db_path.exists():
             self.db_path.write_text("{}")
 
+    def _acquire_process_lock(self) -> None:
+        """
+        Refuse to share the database file with another process.
+        Every process rewrites the whole file from its own index, so a second
+        one (e.g. a webhook replica) would overwrite the first one's changes.
+        """
+        lock_path = self.db_path.with_suffix(self.db_path.suffix + ".lock")
+        self._lock_file = open(lock_path, "w")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.close()
+            self._lock_file = None
+            raise RuntimeError(
+                f"{self.db_path} is used by another process, the JSON backend "
+                "supports a single process only, use NOTIFY_BACKEND=sqlite"
+            )
+
+    def _release_process_lock(self) -> None:
+        """Let another process use the database file"""
+        if self._lock_file is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+
     async def _read_db(self) -> Dict:
         """
         Read the database file.
@@ -41,32 +125,130 @@ class NotificationManager:
             logger.error(f"Error reading database: {e}")
             return {}
 
-    async def _write_db(self, data: Dict) -> None:
+    async def _write_db(self, data: Dict) -> bool:
         """
-        Write to the database file.
+        Write to the database file atomically via a temporary file.
+        Returns whether the write succeeded.
         """
+        tmp_path = self.db_path.with_suffix(self.db_path.suffix + ".tmp")
         try:
-            async with aiofiles.open(self.db_path, 'w') as f:
-                await f.write(json.dumps(data, indent=2))
+            async with aiofiles.open(tmp_path, 'w') as f:
+                await f.write(json.dumps(data, separators=(",", ":")))
+            await aiofiles.os.replace(tmp_path, self.db_path)
+            return True
         except Exception as e:
             logger.error(f"Error writing to database: {e}")
+            return False
+
+    async def _ensure_loaded(self) -> None:
+        """Build in-memory indexes from the database file on first use"""
+        if self._loaded:
+            return
+
+        async with self._lock:
+            if self._loaded:
+                return
+
+            db = await self._read_db()
+            if db and db.get("version") != DB_FORMAT_VERSION:
+                schedules, self._pending = migrate_legacy_subscriptions(db, self.search_results)
+                logger.info(f"Migrated subscriptions of {len(db)} users to schedule keys")
+                self._dirty = True
+            else:
+                schedules = {
+                    key: set(subscribers)
+                    for key, subscribers in db.get("schedules", {}).items()
+                }
+                self._pending = db.get("pending", {})
+                if self._pending and self.search_results is not None:
+                    # Names unknown at the last start may resolve with newer search results
+                    retried, self._pending = migrate_legacy_subscriptions(
+                        self._pending, self.search_results
+                    )
+                    for key, subscribers in retried.items():
+                        schedules.setdefault(key, set()).update(subscribers)
+                    self._dirty = bool(retried)
+
+            if self._pending:
+                # Kept in the file under "pending" so nothing is lost
+                logger.error(
+                    f"Subscriptions of {len(self._pending)} users could not be migrated, "
+                    "retrying on the next start"
+                )
+
+            for key, subscribers in schedules.items():
+                self._schedule_index[key] = subscribers
+                for user_id in subscribers:
+                    self._user_index.setdefault(user_id, set()).add(key)
+            self._loaded = True
+
+        if self._dirty:
+            await self.flush()
+
+    def _mark_dirty(self) -> None:
+        """Schedule a batched flush of pending changes"""
+        self._dirty = True
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        """Wait for the write-behind delay and flush changes to disk"""
+        try:
+            # close() cuts the delay short instead of cancelling a write
+            await asyncio.wait_for(self._closing.wait(), self.flush_interval)
+        except asyncio.TimeoutError:
+            pass
+        await self.flush()
+        if self._dirty and not self._closing.is_set():
+            # The write failed, try again after another delay
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def flush(self) -> None:
+        """
+        Persist in-memory subscriptions to the database file if they changed.
+        Changes stay pending if the write fails.
+        """
+        async with self._lock:
+            if not self._dirty:
+                return
+            data = {
+                "version": DB_FORMAT_VERSION,
+                "schedules": {
+                    key: sorted(subscribers)
+                    for key, subscribers in self._schedule_index.items()
+                },
+            }
+            if self._pending:
+                data["pending"] = self._pending
+            # Updates wait for the lock, so nothing changes while writing
+            if await self._write_db(data):
+                self._dirty = False
+
+    async def close(self) -> None:
+        """
+        Finish the pending flush, write outstanding changes and release the database.
+        """
+        self._closing.set()
+        if self._flush_task is not None:
+            await self._flush_task
+        await self.flush()
+        self._release_process_lock()
 
     async def subscribe(self, user_id: int, schedule_id: str) -> bool:
         """
         Subscribe a user to a schedule.
         """
         try:
-            db = await self._read_db()
-            user_id_str = str(user_id)
-
-            if user_id_str not in db:
-                db[user_id_str] = []
+            await self._ensure_loaded()
+            async with self._lock:
+                subscriptions = self._user_index.setdefault(user_id, set())
+                if schedule_id in subscriptions:
+                    return False
 
-            if schedule_id not in db[user_id_str]:
-                db[user_id_str].append(schedule_id)
-                await self._write_db(db)
+                subscriptions.add(schedule_id)
+                self._schedule_index.setdefault(schedule_id, set()).add(user_id)
+                self._mark_dirty()
                 return True
-            return False
         except Exception as e:
             logger.error(f"Error subscribing user {user_id} to schedule {schedule_id}: {e}")
             return False
@@ -76,25 +258,38 @@ class NotificationManager:
         Unsubscribe a user from a schedule.
         """
         try:
-            db = await self._read_db()
-            user_id_str = str(user_id)
+            await self._ensure_loaded()
+            async with self._lock:
+                subscriptions = self._user_index.get(user_id)
+                if not subscriptions or schedule_id not in subscriptions:
+                    return False
 
-            if user_id_str in db and schedule_id in db[user_id_str]:
-                db[user_id_str].remove(schedule_id)
-                await self._write_db(db)
+                subscriptions.remove(schedule_id)
+                subscribers = self._schedule_index.get(schedule_id)
+                if subscribers is not None:
+                    subscribers.discard(user_id)
+                    if not subscribers:
+                        del self._schedule_index[schedule_id]
+                self._mark_dirty()
                 return True
-            return False
         except Exception as e:
             logger.error(f"Error unsubscribing user {user_id} from schedule {schedule_id}: {e}")
             return False
 
+    async def is_subscribed(self, user_id: int, schedule_id: str) -> bool:
+        """
+        Check whether a user is subscribed to a schedule.
+        """
+        await self._ensure_loaded()
+        return user_id in self._schedule_index.get(schedule_id, ())
+
     async def get_subscribed(self, user_id: int) -> List[str]:
         """
         Get all schedules a user is subscribed to.
         """
         try:
-            db = await self._read_db()
-            return db.get(str(user_id), [])
+            await self._ensure_loaded()
+            return list(self._user_index.get(user_id, ()))
         except Exception as e:
             logger.error(f"Error getting subscriptions for user {user_id}: {e}")
             return []
@@ -104,14 +299,22 @@ class NotificationManager:
         Get all users subscribed to a specific schedule.
         """
         try:
-            db = await self._read_db()
-            subscribers = []
-
-            for user_id_str, subscriptions in db.items():
-                if schedule_id in subscriptions:
-                    subscribers.append(int(user_id_str))
-
-            return subscribers
+            await self._ensure_loaded()
+            return list(self._schedule_index.get(schedule_id, ()))
         except Exception as e:
             logger.error(f"Error getting subscribers for schedule {schedule_id}: {e}")
             return []
+
+    async def get_subscribers_many(self, schedule_ids: Iterable[str]) -> Dict[str, List[int]]:
+        """
+        Get subscribers for several schedules at once.
+        """
+        try:
+            await self._ensure_loaded()
+            return {
+                schedule_id: list(self._schedule_index.get(schedule_id, ()))
+                for schedule_id in schedule_ids
+            }
+        except Exception as e:
+            logger.error(f"Error getting subscribers for schedules: {e}")
+            return {}
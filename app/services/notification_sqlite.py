@@ -0,0 +1,304 @@
+"""
+SQLite storage backend for user subscriptions to schedules.
+Drop-in alternative to the JSON-based NotificationManager with indexed
+(schedule type, upstream id, user id) rows, transactional updates and a
+one-shot migration from the JSON database.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from services.notification_processor import DB_FORMAT_VERSION, migrate_legacy_subscriptions
+from services.search_results import SearchResultList, make_schedule_key, parse_schedule_key
+
+logger = logging.getLogger(__name__)
+
+# Schedule ids bound per IN (...) query, SQLite allows 999 variables in older versions
+MAX_QUERY_VARIABLES = 900
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS schedule_subscriptions (
+    schedule_type TEXT NOT NULL,
+    schedule_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    PRIMARY KEY (schedule_type, schedule_id, user_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_schedule_subscriptions_user
+    ON schedule_subscriptions (user_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class SQLiteNotificationManager:
+    """
+    Manages user subscriptions to schedules in a SQLite database.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "database/users.sqlite3",
+        legacy_json_path: Optional[str] = "database/users.json",
+        search_results: Optional[SearchResultList] = None,
+    ):
+        """
+        Initialize SQLiteNotificationManager with database path and optional JSON database to migrate.
+        Search results are used to migrate subscriptions stored under display names.
+        """
+        self.db_path = Path(db_path)
+        self.legacy_json_path = Path(legacy_json_path) if legacy_json_path else None
+        self.search_results = search_results
+        self._conn: Optional[sqlite3.Connection] = None
+        # Single worker thread keeps all access to the connection serialized
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="subscriptions-db")
+
+    async def _run(self, func, *args):
+        """Run a blocking database call on the dedicated thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args))
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the connection, create the schema and migrate legacy data on first use"""
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+            self._migrate_name_table()
+            self._migrate_from_json()
+        return self._conn
+
+    def _insert_schedules(self, schedules: Dict[str, Set[int]]) -> int:
+        """Insert {schedule key: {user ids}} rows, returning the number of rows"""
+        rows = [
+            (*parse_schedule_key(key), user_id)
+            for key, subscribers in schedules.items()
+            for user_id in subscribers
+        ]
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO schedule_subscriptions (schedule_type, schedule_id, user_id) "
+            "VALUES (?, ?, ?)",
+            rows,
+        )
+        return len(rows)
+
+    def _migrate_name_table(self) -> None:
+        """
+        Convert the older table keyed by display names to schedule keys.
+        Rows whose names do not resolve stay in the old table for the next start.
+        """
+        conn = self._conn
+        if not conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'subscriptions'"
+        ).fetchone():
+            return
+
+        legacy: Dict[str, List[str]] = {}
+        for user_id, name in conn.execute("SELECT user_id, schedule_id FROM subscriptions"):
+            legacy.setdefault(str(user_id), []).append(name)
+
+        schedules, unresolved = migrate_legacy_subscriptions(legacy, self.search_results)
+        with conn:
+            count = self._insert_schedules(schedules)
+            if unresolved:
+                kept = {(user_id, name) for user_id, names in unresolved.items() for name in names}
+                conn.executemany(
+                    "DELETE FROM subscriptions WHERE user_id = ? AND schedule_id = ?",
+                    [
+                        (int(user_id), name)
+                        for user_id, names in legacy.items()
+                        for name in names
+                        if (user_id, name) not in kept
+                    ],
+                )
+            else:
+                conn.execute("DROP TABLE subscriptions")
+        logger.info(f"Migrated {count} subscriptions to schedule keys")
+        if unresolved:
+            logger.error(f"Kept unresolved subscriptions of {len(unresolved)} users for a later migration")
+
+    def _migrate_from_json(self) -> None:
+        """
+        Import subscriptions from the JSON database once.
+        Names that do not resolve are kept in the meta table and retried on the next start,
+        the database is only marked as migrated once nothing is left.
+        """
+        if not self.legacy_json_path or not self.legacy_json_path.exists():
+            return
+
+        conn = self._conn
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+            return
+
+        pending = conn.execute("SELECT value FROM meta WHERE key = 'json_pending'").fetchone()
+        try:
+            if pending:
+                db = json.loads(pending[0])
+            else:
+                content = self.legacy_json_path.read_text()
+                db = json.loads(content) if content else {}
+        except Exception as e:
+            logger.error(f"Error reading legacy database {self.legacy_json_path}: {e}")
+            return
+
+        if db.get("version") == DB_FORMAT_VERSION:
+            schedules = {key: set(users) for key, users in db.get("schedules", {}).items()}
+            unresolved = {}
+        else:
+            schedules, unresolved = migrate_legacy_subscriptions(db, self.search_results)
+
+        with conn:
+            count = self._insert_schedules(schedules)
+            if unresolved:
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('json_pending', ?)",
+                    (json.dumps(unresolved, ensure_ascii=False),),
+                )
+            else:
+                conn.execute("DELETE FROM meta WHERE key = 'json_pending'")
+                conn.execute(
+                    "INSERT INTO meta (key, value) VALUES ('json_migrated', ?)",
+                    (str(self.legacy_json_path),),
+                )
+        logger.info(f"Migrated {count} subscriptions from {self.legacy_json_path}")
+        if unresolved:
+            logger.error(
+                f"Subscriptions of {len(unresolved)} users from {self.legacy_json_path} "
+                "could not be migrated, retrying on the next start"
+            )
+
+    def _subscribe(self, user_id: int, schedule_id: str) -> bool:
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO schedule_subscriptions (schedule_type, schedule_id, user_id) "
+                "VALUES (?, ?, ?)",
+                (*parse_schedule_key(schedule_id), user_id),
+            )
+        return cursor.rowcount == 1
+
+    def _unsubscribe(self, user_id: int, schedule_id: str) -> bool:
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                "DELETE FROM schedule_subscriptions "
+                "WHERE schedule_type = ? AND schedule_id = ? AND user_id = ?",
+                (*parse_schedule_key(schedule_id), user_id),
+            )
+        return cursor.rowcount == 1
+
+    def _is_subscribed(self, user_id: int, schedule_id: str) -> bool:
+        row = self._connect().execute(
+            "SELECT 1 FROM schedule_subscriptions "
+            "WHERE schedule_type = ? AND schedule_id = ? AND user_id = ?",
+            (*parse_schedule_key(schedule_id), user_id),
+        ).fetchone()
+        return row is not None
+
+    def _get_subscribed(self, user_id: int) -> List[str]:
+        rows = self._connect().execute(
+            "SELECT schedule_type, schedule_id FROM schedule_subscriptions WHERE user_id = ?",
+            (user_id,),
+        ).fetchall()
+        return [make_schedule_key(schedule_type, schedule_id) for schedule_type, schedule_id in rows]
+
+    def _get_subscribers_many(self, schedule_ids: List[str]) -> Dict[str, List[int]]:
+        conn = self._connect()
+        result: Dict[str, List[int]] = {schedule_id: [] for schedule_id in schedule_ids}
+        ids_by_type: Dict[str, List[int]] = {}
+        for schedule_id in result:
+            schedule_type, upstream_id = parse_schedule_key(schedule_id)
+            ids_by_type.setdefault(schedule_type, []).append(upstream_id)
+
+        for schedule_type, upstream_ids in ids_by_type.items():
+            # One query per chunk, kept under SQLite's limit of bound variables
+            for start in range(0, len(upstream_ids), MAX_QUERY_VARIABLES):
+                chunk = upstream_ids[start:start + MAX_QUERY_VARIABLES]
+                rows = conn.execute(
+                    "SELECT schedule_id, user_id FROM schedule_subscriptions "
+                    f"WHERE schedule_type = ? AND schedule_id IN ({', '.join('?' * len(chunk))})",
+                    (schedule_type, *chunk),
+                )
+                for upstream_id, user_id in rows:
+                    result[make_schedule_key(schedule_type, upstream_id)].append(user_id)
+        return result
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def subscribe(self, user_id: int, schedule_id: str) -> bool:
+        """
+        Subscribe a user to a schedule.
+        """
+        try:
+            return await self._run(self._subscribe, user_id, schedule_id)
+        except Exception as e:
+            logger.error(f"Error subscribing user {user_id} to schedule {schedule_id}: {e}")
+            return False
+
+    async def unsubscribe(self, user_id: int, schedule_id: str) -> bool:
+        """
+        Unsubscribe a user from a schedule.
+        """
+        try:
+            return await self._run(self._unsubscribe, user_id, schedule_id)
+        except Exception as e:
+            logger.error(f"Error unsubscribing user {user_id} from schedule {schedule_id}: {e}")
+            return False
+
+    async def is_subscribed(self, user_id: int, schedule_id: str) -> bool:
+        """
+        Check whether a user is subscribed to a schedule.
+        """
+        try:
+            return await self._run(self._is_subscribed, user_id, schedule_id)
+        except Exception as e:
+            logger.error(f"Error checking subscription of user {user_id} to {schedule_id}: {e}")
+            return False
+
+    async def get_subscribed(self, user_id: int) -> List[str]:
+        """
+        Get all schedules a user is subscribed to.
+        """
+        try:
+            return await self._run(self._get_subscribed, user_id)
+        except Exception as e:
+            logger.error(f"Error getting subscriptions for user {user_id}: {e}")
+            return []
+
+    async def get_subscribers(self, schedule_id: str) -> List[int]:
+        """
+        Get all users subscribed to a specific schedule.
+        """
+        subscribers = await self.get_subscribers_many([schedule_id])
+        return subscribers.get(schedule_id, [])
+
+    async def get_subscribers_many(self, schedule_ids: Iterable[str]) -> Dict[str, List[int]]:
+        """
+        Get subscribers for several schedules in one round trip to the database thread.
+        """
+        schedule_ids = list(dict.fromkeys(schedule_ids))
+        try:
+            return await self._run(self._get_subscribers_many, schedule_ids)
+        except Exception as e:
+            logger.error(f"Error getting subscribers for schedules {schedule_ids}: {e}")
+            return {}
+
+    async def close(self) -> None:
+        """
+        Close the database connection.
+        """
+        await self._run(self._close)
+        self._executor.shutdown(wait=False)
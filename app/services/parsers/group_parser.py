@@ -513,6 +513,17 @@ def _compare_schedules(old_schedule: Schedule, new_schedule: Schedule) -> List[C
     return changes
 
 
+def get_schedule_from_cache(schedule_id: int, directory: str) -> Optional[Schedule]:
+    """
+    Load a previously fetched schedule from the cache directory without network access.
+    Returns None if the schedule was never cached.
+    """
+    cache_file = Path(directory) / _generate_cache_filename(str(schedule_id))
+    if not cache_file.exists():
+        return None
+    return _load_schedule_from_cache(cache_file)
+
+
 async def get_schedule_from_url(url: str, directory: Optional[str] = None) -> Schedule:
     """
     Fetches schedule from URL or loads from cache if available.
@@ -0,0 +1,289 @@
+"""
+Schedule cache module for sharing work between users viewing the same schedule.
+Provides schedule content hashing, a shared store of parsed schedules
+addressed by compact references together with precomputed navigation
+tables, and an LRU cache of rendered schedule views.
+"""
+
+import hashlib
+import json
+import logging
+from collections import Counter, OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from services.parsers import group_parser, professor_parser
+from services.search_results import parse_schedule_key
+
+logger = logging.getLogger(__name__)
+
+PARSERS = {"group": group_parser, "professor": professor_parser}
+
+# Schedule fields that do not affect schedule content
+VOLATILE_FIELDS = ("source", "source_date", "changes")
+
+DAYS_OF_WEEK = {
+    0: "Понедельник",
+    1: "Вторник",
+    2: "Среда",
+    3: "Четверг",
+    4: "Пятница",
+    5: "Суббота",
+    6: "Воскресенье",
+}
+
+
+def content_hash(schedule: Any) -> str:
+    """
+    Compute a short hash of schedule content, ignoring fetch metadata.
+    """
+    payload = {
+        key: value
+        for key, value in asdict(schedule).items()
+        if key not in VOLATILE_FIELDS
+    }
+    serialized = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.blake2b(serialized.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class LRUCache:
+    """
+    Bounded mapping that evicts the least recently used entries.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        """
+        Initialize LRUCache with maximum number of entries.
+        """
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a value and mark it as recently used"""
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the oldest entry when full"""
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        """Remove a value if present"""
+        return self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        self._data.clear()
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """Snapshot of entries from least to most recently used"""
+        return list(self._data.items())
+
+
+class RenderCache(LRUCache):
+    """
+    Rendered schedule texts keyed by (content hash, source, date, tab, week, day).
+    Shared by all users viewing the same schedule.
+    """
+
+
+@dataclass
+class NavigationTable:
+    """
+    Precomputed day/week paging for one schedule.
+    Weeks are numbered from 1, weekdays from 0 (Monday).
+    """
+    # week -> number of days with lessons (at least 1)
+    num_days: Dict[int, int] = field(default_factory=dict)
+    # (week, weekday) -> (current day index, num_max_days, week)
+    current_day: Dict[Tuple[int, int], Tuple[int, int, int]] = field(default_factory=dict)
+
+    def get_current_day(self, week_number: int, weekday: int) -> Tuple[int, int, int]:
+        """Day to open for a week on a given weekday, or the next available one"""
+        return self.current_day.get((week_number, weekday), (1, 1, week_number))
+
+    def get_num_days(self, week_number: int) -> int:
+        """Number of pages in a week"""
+        return self.num_days.get(week_number, 1)
+
+
+def _available_days(schedule: Any, week_number: int) -> List[str]:
+    """Names of days with lessons in a week"""
+    if not 1 <= week_number <= len(schedule.weeks):
+        return []
+    return [day.day_name for day in schedule.weeks[week_number - 1].days if day.lessons]
+
+
+def _compute_current_day(
+    schedule: Any, week_number: int, weekday: int
+) -> Tuple[int, int, int]:
+    """Find the day to open for a week on a given weekday"""
+    available_days = _available_days(schedule, week_number)
+    num_max_days = len(available_days)
+    if num_max_days == 0:
+        return 1, 1, week_number
+
+    # Today or the next available day in the current week
+    for day in range(weekday, 7):
+        if DAYS_OF_WEEK[day] in available_days:
+            return available_days.index(DAYS_OF_WEEK[day]) + 1, num_max_days, week_number
+
+    # If not found, switch to next week and start from its beginning
+    next_week = 2 if week_number == 1 else 1
+    next_week_days = _available_days(schedule, next_week)
+    if next_week_days:
+        return 1, len(next_week_days), next_week
+
+    # If still nothing found, return first available day in current week
+    return 1, num_max_days, week_number
+
+
+def build_navigation(schedule: Any) -> NavigationTable:
+    """
+    Precompute navigation lookups for every week and weekday of a schedule.
+    """
+    navigation = NavigationTable()
+    if not schedule.weeks:
+        return navigation
+
+    for week_number in range(1, len(schedule.weeks) + 1):
+        navigation.num_days[week_number] = len(_available_days(schedule, week_number)) or 1
+        for weekday in range(7):
+            navigation.current_day[(week_number, weekday)] = _compute_current_day(
+                schedule, week_number, weekday
+            )
+    return navigation
+
+
+@dataclass
+class CachedSchedule:
+    """Parsed schedule shared between users"""
+    key: str  # Schedule key, e.g. 'group:643'
+    content_hash: str
+    schedule: Any
+    navigation: NavigationTable
+
+    @classmethod
+    def create(cls, key: str, schedule: Any) -> "CachedSchedule":
+        """Build an entry with content hash and navigation table"""
+        return cls(
+            key=key,
+            content_hash=content_hash(schedule),
+            schedule=schedule,
+            navigation=build_navigation(schedule),
+        )
+
+    @property
+    def ref(self) -> str:
+        """Compact reference stored in user state, e.g. 'group:643:1f2e3d4c5b6a7980'"""
+        return f"{self.key}:{self.content_hash}"
+
+
+class ScheduleStore:
+    """
+    Shared parsed schedules addressed by reference.
+    Evicted or unknown references are restored from the parsers' filesystem cache.
+    """
+
+    def __init__(self, maxsize: int = 512, cache_dir: str = "cache"):
+        """
+        Initialize ScheduleStore with maximum number of schedules kept in memory.
+        """
+        self.cache_dir = cache_dir
+        self._entries = LRUCache(maxsize)
+        # schedule key -> reference of its latest version
+        self._latest: Dict[str, str] = {}
+        # schedule key -> (content hash, source, source date) of its latest fetch
+        self._sources: Dict[str, Tuple[str, Any, Any]] = {}
+        # schedule key -> number of times it was opened
+        self.views: Counter = Counter()
+
+    def put(self, key: str, schedule: Any) -> CachedSchedule:
+        """
+        Store a freshly fetched schedule and return its entry.
+        """
+        entry = CachedSchedule.create(key, schedule)
+        self._entries.put(entry.ref, entry)
+        self._latest[key] = entry.ref
+        self._sources[key] = (entry.content_hash, schedule.source, schedule.source_date)
+        self.views[key] += 1
+        return entry
+
+    def most_viewed(self, n: int) -> List[str]:
+        """
+        Get keys of the n most often opened schedules.
+        """
+        return [key for key, _ in self.views.most_common(n)]
+
+    def get_latest(self, key: str) -> Optional[CachedSchedule]:
+        """
+        Get the latest known version of a schedule by key.
+        """
+        ref = self._latest.get(key)
+        if ref is not None:
+            return self.get(ref)
+        return self._restore(key)
+
+    def get(self, ref: str) -> Optional[CachedSchedule]:
+        """
+        Resolve a reference to a schedule entry.
+        If the referenced version is gone and the cache holds newer content, the newer
+        entry is returned under its own reference, callers compare entry.ref to ref.
+        """
+        entry = self._entries.get(ref)
+        if entry is None:
+            entry = self._restore(ref.rsplit(":", 1)[0])
+        return entry
+
+    def _restore(self, key: str) -> Optional[CachedSchedule]:
+        """Load the cached version of a schedule into the store"""
+        entry = self._load(key)
+        if entry is None:
+            return None
+        cached = self._entries.get(entry.ref)
+        if cached is not None:
+            return cached
+
+        # The file cache marks loaded schedules as proxied, keep how they were fetched
+        content_hash, source, source_date = self._sources.get(key, (None, None, None))
+        if content_hash == entry.content_hash:
+            entry.schedule.source = source
+            entry.schedule.source_date = source_date
+        else:
+            schedule_type, _ = parse_schedule_key(key)
+            entry.schedule.source = PARSERS[schedule_type].SourceType.RAW
+
+        self._entries.put(entry.ref, entry)
+        # The file cache always holds the newest fetched version
+        self._latest[key] = entry.ref
+        return entry
+
+    def _load(self, key: str) -> Optional[CachedSchedule]:
+        """Load a schedule from the parsers' filesystem cache"""
+        try:
+            schedule_type, schedule_id = parse_schedule_key(key)
+            schedule = PARSERS[schedule_type].get_schedule_from_cache(schedule_id, self.cache_dir)
+        except Exception as e:
+            logger.error(f"Error loading cached schedule {key}: {e}")
+            return None
+
+        if schedule is None:
+            return None
+        return CachedSchedule.create(key, schedule)
@@ -1,9 +1,11 @@
 import logging
 import asyncio
+import bisect
 import json
 import os
-from typing import Optional, List, Dict, TypedDict
-from rapidfuzz import fuzz
+import re
+from typing import Optional, List, Dict, Tuple, TypedDict
+from rapidfuzz import fuzz, process
 from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
@@ -30,6 +32,11 @@ class SearchResult:
     def __repr__(self) -> str:
         return f"SearchResult(name='{self.name}', type='{self.type}', id={self.id}, url='{self.url}')"
 
+    @property
+    def key(self) -> str:
+        """Stable schedule key built from type and upstream id"""
+        return make_schedule_key(self.type, self.id)
+
     def to_dict(self) -> SearchResultDict:
         """Convert SearchResult to dictionary format"""
         return {
@@ -39,6 +46,19 @@ class SearchResult:
             "url": self.url
         }
 
+def make_schedule_key(schedule_type: str, schedule_id: int) -> str:
+    """
+    Build a stable schedule key like 'group:643' from type and upstream id.
+    """
+    return f"{schedule_type}:{schedule_id}"
+
+def parse_schedule_key(key: str) -> Tuple[str, int]:
+    """
+    Split a schedule key back into type and upstream id.
+    """
+    schedule_type, schedule_id = key.split(":", 1)
+    return schedule_type, int(schedule_id)
+
 def transliterate(text: str) -> str:
     """
     Transliterate text from Cyrillic to Latin characters.
@@ -55,6 +75,13 @@ def transliterate(text: str) -> str:
 
     return ''.join(CYRILLIC_TO_LATIN.get(char, char) for char in text.lower())
 
+def normalize_name(text: str) -> str:
+    """
+    Normalize a name for prefix matching: lowercase without spaces and punctuation.
+    'БПИ22-01' -> 'бпи2201', 'Иванов И. И.' -> 'ивановии'
+    """
+    return re.sub(r'[\W_]+', '', text.lower())
+
 class SourceType(Enum):
     PROXY = "PROXY"  # From filesystem cache
     RAW = "RAW"      # From network request
@@ -64,6 +91,80 @@ class SearchResultList:
     results: List[SearchResult] = field(default_factory=list)
     source: SourceType = field(default=SourceType.RAW)
     source_date: datetime = field(default_factory=datetime.now)
+    _name_index: Optional[Dict[str, List[str]]] = field(default=None, init=False, repr=False)
+    # Sorted (normalized name, record index) pairs in Cyrillic and Latin spelling
+    _prefix_index: Optional[List[Tuple[str, int]]] = field(default=None, init=False, repr=False)
+    # Latin spelling of every name for fuzzy matching, aligned with results
+    _fuzzy_choices: Optional[List[str]] = field(default=None, init=False, repr=False)
+
+    def _build_search_index(self) -> None:
+        """Build prefix and fuzzy indexes once"""
+        prefix_index = set()
+        self._fuzzy_choices = []
+        for index, record in enumerate(self.results):
+            name = normalize_name(record['name'])
+            latin_name = transliterate(name)
+            prefix_index.add((name, index))
+            prefix_index.add((latin_name, index))
+            self._fuzzy_choices.append(latin_name)
+        self._prefix_index = sorted(prefix_index)
+
+    def search_by_prefix(self, query: str, limit: int = 50) -> List[SearchResult]:
+        """
+        Find records whose name starts with the query, in Cyrillic or Latin spelling.
+        Shorter names come first so the exact group is on top.
+        """
+        if self._prefix_index is None:
+            self._build_search_index()
+
+        indexes = set()
+        for prefix in {normalize_name(query), transliterate(normalize_name(query))}:
+            if not prefix:
+                continue
+            start = bisect.bisect_left(self._prefix_index, (prefix,))
+            for name, index in self._prefix_index[start:]:
+                if not name.startswith(prefix):
+                    break
+                indexes.add(index)
+
+        records = sorted(
+            (self.results[index] for index in indexes),
+            key=lambda record: (len(record['name']), record['name']),
+        )
+        return [SearchResult(**record) for record in records[:limit]]
+
+    def search_fuzzy(self, query: str, limit: int = 50, score_cutoff: int = 60) -> List[SearchResult]:
+        """
+        Find records with names similar to the query, best matches first.
+        """
+        if self._fuzzy_choices is None:
+            self._build_search_index()
+
+        latin_query = transliterate(normalize_name(query))
+        if not latin_query:
+            return []
+
+        matches = process.extract(
+            latin_query,
+            self._fuzzy_choices,
+            scorer=fuzz.ratio,
+            limit=limit,
+            score_cutoff=score_cutoff,
+        )
+        return [SearchResult(**self.results[index]) for _, _, index in matches]
+
+    def get_keys_by_name(self, name: str) -> List[str]:
+        """
+        Get schedule keys of all records with exactly this display name.
+        Several professors may share the same short name.
+        """
+        if self._name_index is None:
+            self._name_index = {}
+            for record in self.results:
+                key = make_schedule_key(record['type'], record['id'])
+                self._name_index.setdefault(record['name'], []).append(key)
+
+        return self._name_index.get(name, [])
 
     def get_by_search_query(self, query: str) -> Optional[SearchResult]:
         """
@@ -0,0 +1,137 @@
+"""
+Streaming message module for text that grows or changes over time.
+Edits a Telegram message at most once per interval, backs off on flood
+control and always delivers the final text.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import Message
+
+logger = logging.getLogger(__name__)
+
+# Attempts to deliver the final text
+FINAL_ATTEMPTS = 5
+
+
+class StreamingMessage:
+    """
+    Message that is sent on the first update and edited on later ones.
+    Intermediate texts are coalesced, only the latest one is sent.
+    """
+
+    def __init__(
+        self,
+        chat_message: Message,
+        min_interval: float = 1.0,
+        parse_mode: Optional[str] = None,
+        message: Optional[Message] = None,
+    ):
+        """
+        Initialize StreamingMessage that answers chat_message, or edits message if given.
+        min_interval is the minimum time in seconds between two edits.
+        """
+        self.chat_message = chat_message
+        self.min_interval = min_interval
+        self.parse_mode = parse_mode
+        self.message = message
+        self.text: Optional[str] = None
+        self._sent_text: Optional[str] = message.text if message else None
+        self._last_flush = 0.0
+        self._not_before = 0.0  # flood control deadline
+        self._flush_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def _send(self, text: str, parse_mode: Optional[str]) -> None:
+        """Send or edit the message with text"""
+        if self.message is None:
+            self.message = await self.chat_message.answer(text, parse_mode=parse_mode)
+        else:
+            await self.message.edit_text(text, parse_mode=parse_mode)
+
+    async def _flush(self) -> None:
+        """Send the latest text, skipping it on errors"""
+        async with self._lock:
+            text = self.text
+            if text is None or text == self._sent_text or time.monotonic() < self._not_before:
+                return
+            self._last_flush = time.monotonic()
+            try:
+                await self._send(text, self.parse_mode)
+                self._sent_text = text
+            except TelegramRetryAfter as e:
+                logger.debug(f"Flood control on streaming message, retry after {e.retry_after}s")
+                self._not_before = time.monotonic() + e.retry_after
+            except TelegramBadRequest as e:
+                # Partial markdown may not parse yet, the next text will be tried
+                if "message is not modified" in str(e):
+                    self._sent_text = text
+                else:
+                    logger.debug(f"Failed to update streaming message: {e}")
+
+    async def _flush_later(self, delay: float) -> None:
+        """Flush once the interval since the last edit has passed"""
+        await asyncio.sleep(delay)
+        self._flush_task = None
+        await self._flush()
+
+    async def update(self, text: str) -> None:
+        """
+        Set new text, sending it now or once the interval allows.
+        """
+        self.text = text
+        now = time.monotonic()
+        ready_at = max(self._last_flush + self.min_interval, self._not_before)
+        if now >= ready_at and not self._lock.locked():
+            await self._flush()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later(max(0.0, ready_at - now)))
+
+    async def finish(self, text: Optional[str] = None) -> Optional[Message]:
+        """
+        Deliver the final text, waiting out flood control.
+        Falls back to plain text if it cannot be parsed, and to a new message
+        if the sent one cannot be edited.
+        """
+        if text is not None:
+            self.text = text
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+
+        async with self._lock:
+            if self.text is None or self.text == self._sent_text:
+                return self.message
+
+            parse_mode = self.parse_mode
+            for _ in range(FINAL_ATTEMPTS):
+                wait = self._not_before - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                try:
+                    await self._send(self.text, parse_mode)
+                    self._sent_text = self.text
+                    return self.message
+                except TelegramRetryAfter as e:
+                    self._not_before = time.monotonic() + e.retry_after
+                except TelegramBadRequest as e:
+                    if "message is not modified" in str(e):
+                        self._sent_text = self.text
+                        return self.message
+                    if parse_mode is None:
+                        if self.message is None:
+                            logger.error(f"Failed to send final streaming message text: {e}")
+                            return None
+                        # The message cannot be edited, e.g. it was deleted, send a new one
+                        logger.warning(f"Sending final text as a new message: {e}")
+                        self.message = None
+                        continue
+                    logger.debug(f"Sending final text without formatting: {e}")
+                    parse_mode = None
+
+            logger.error("Failed to deliver final streaming message text")
+            return self.message
@@ -0,0 +1,64 @@
+"""
+Webhook module for receiving updates through an embedded aiohttp server.
+Several bot instances can run behind a load balancer with the same secret token.
+"""
+
+import asyncio
+import logging
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+
+async def run_webhook(
+    dp: Dispatcher,
+    bot: Bot,
+    url: str,
+    secret_token: str,
+    host: str = "0.0.0.0",
+    port: int = 8080,
+    path: str = "/webhook",
+    max_connections: int = 40,
+) -> None:
+    """
+    Register the webhook with Telegram and serve updates until cancelled.
+    url is the public address Telegram posts to, path is where this server listens.
+    Requests without secret_token in the X-Telegram-Bot-Api-Secret-Token header are rejected.
+    """
+    if not secret_token:
+        raise ValueError("Webhook mode requires a secret token")
+
+    async def on_startup(bot: Bot) -> None:
+        await bot.set_webhook(
+            url,
+            secret_token=secret_token,
+            max_connections=max_connections,
+            allowed_updates=dp.resolve_used_update_types(),
+            drop_pending_updates=True,
+        )
+        logger.info(f"Webhook set to {url}")
+
+    dp.startup.register(on_startup)
+
+    app = web.Application()
+    # Updates are acknowledged at once and processed in background tasks,
+    # bounded by ConcurrencyMiddleware
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        handle_in_background=True,
+        secret_token=secret_token,
+    ).register(app, path=path)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=host, port=port)
+    await site.start()
+    logger.info(f"Listening for webhook updates on {host}:{port}{path}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()